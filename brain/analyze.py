@@ -2,24 +2,46 @@
 """
 AI Feedback Miner Brain Service - Hybrid Approach
 Efficient analysis using traditional ML + minimal LLM usage
-Reduces API calls from 11+ to just 2
+Reduces API calls from 11+ to just 1
 """
 
+import os
 import sys
 import json
 import re
 import math
-from typing import List, Dict, Any
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy.sparse import csr_matrix
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from sqlite_cache import SQLiteTTLCache
+
+# Fast JSON (optional); orjson also serializes numpy scalars natively
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# GPU KMeans (optional, RAPIDS)
+try:
+    from cuml.cluster import KMeans as KMeansGPU
+    HAS_GPU = True
+except ImportError:
+    HAS_GPU = False
 
 # Import hybrid analyzer (efficient approach)
 try:
     from hybrid_analyzer import analyze_feedback_hybrid
     HYBRID_AVAILABLE = True
-    print("Using hybrid analyzer (2 LLM calls max)", file=sys.stderr)
+    print("Using hybrid analyzer (1 LLM call max)", file=sys.stderr)
 except ImportError:
     HYBRID_AVAILABLE = False
     print("Warning: Hybrid analyzer not available, falling back to original", file=sys.stderr)
@@ -27,20 +49,55 @@ except ImportError:
 # Fallback to original Gemini analyzer
 if not HYBRID_AVAILABLE:
     try:
-        from gemini_analyzer import get_gemini_analyzer
+        from gemini_analyzer import get_gemini_analyzer, GEMINI_CALL_BUDGET_SECONDS
         GEMINI_AVAILABLE = True
     except ImportError:
         GEMINI_AVAILABLE = False
         print("Error: No analyzer available", file=sys.stderr)
         sys.exit(1)
 
-# Global analyzer
+# Global analyzer (one per process; the lock keeps threaded workers from
+# initializing it twice)
 _analyzer = None
+_analyzer_lock = threading.Lock()
+
+# Text cleaning patterns; a run of punctuation and/or whitespace collapses to a
+# single space, so stripping symbols and normalizing whitespace is one pass
+_URL_RE = re.compile(r"https?://\S+")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+# Concurrent Gemini requests issued by the fallback pipeline
+GEMINI_MAX_WORKERS = 4
+
+# Corpus size at which clustering moves to the GPU when cuML is installed
+GPU_KMEANS_MIN_ITEMS = 5000
+
+# Below this many texts, TF-IDF + KMeans is meaningless; use a single cluster
+MIN_ITEMS_FOR_CLUSTERING = 4
+
+# On-disk sentiment cache keyed by sha256 of the cleaned text, so re-analyses
+# of overlapping corpora skip the Gemini call for texts already scored
+SENTIMENT_CACHE_PATH = os.getenv(
+    "SENTIMENT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "sentiment_cache.db"),
+)
+SENTIMENT_CACHE_TTL_SECONDS = 7 * 24 * 3600
+# sentiment_v2 adds the ts column; the old "sentiment" table had no expiry and
+# could hold keyword-fallback results, so it is ignored rather than migrated
+_sentiment_cache = SQLiteTTLCache(SENTIMENT_CACHE_PATH, "sentiment_v2", SENTIMENT_CACHE_TTL_SECONDS, value_column="result")
+
+# Stateless hashing vectorizer for clustering embeddings; there is no
+# vocabulary to fit, so one instance serves every request
+_vectorizer = HashingVectorizer(n_features=1024, alternate_sign=False, stop_words='english', norm='l2')
 
 def get_analyzer():
     """Get analyzer instance (hybrid preferred, Gemini fallback)"""
     global _analyzer
-    if _analyzer is None:
+    if _analyzer is not None:
+        return _analyzer
+    with _analyzer_lock:
+        if _analyzer is not None:
+            return _analyzer
         if HYBRID_AVAILABLE:
             from hybrid_analyzer import get_hybrid_analyzer
             _analyzer = get_hybrid_analyzer()
@@ -56,65 +113,6 @@ def get_analyzer():
             sys.exit(1)
     return _analyzer
 
-def clean_text(text: str) -> str:
-    """Clean and normalize text"""
-    if not isinstance(text, str):
-        return ""
-    text = text.lower()
-    text = re.sub(r"https?://\S+", " ", text)
-    text = re.sub(r"[^a-z0-9\s]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
-
-def get_sentiment_batch(texts: List[str]) -> List[Dict[str, Any]]:
-    """Get sentiment scores using Gemini batch processing"""
-    gemini = get_gemini()
-    results = gemini.analyze_sentiment_batch(texts)
-    return [{
-        "score": result["sentiment"],
-        "confidence": result["confidence"],
-        "reasoning": result["reasoning"],
-        "method": "gemini"
-    } for result in results]
-
-def get_sentiment(text: str) -> Dict[str, Any]:
-    """Get sentiment score using Gemini (single text fallback)"""
-    results = get_sentiment_batch([text])
-    return results[0] if results else {
-        "score": 0.0,
-        "confidence": 0.0,
-        "reasoning": "No analysis available",
-        "method": "gemini"
-    }
-
-def get_embeddings(texts: List[str]) -> np.ndarray:
-    """Get embeddings using Gemini (simplified approach)"""
-    # For clustering, we'll use TF-IDF as a simple embedding method
-    # This is still needed for the clustering algorithm
-    vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-    tfidf_matrix = vectorizer.fit_transform(texts)
-    return tfidf_matrix.toarray()
-
-def auto_label_clusters(texts: List[str], labels: np.ndarray, top_k: int = 3) -> Dict[int, Dict[str, Any]]:
-    """Generate cluster labels using Gemini"""
-    df = pd.DataFrame({"text": texts, "label": labels})
-    label_to_texts = {int(l): df[df.label == l]["text"].tolist() for l in sorted(df.label.unique())}
-    
-    gemini = get_gemini()
-    enhanced_labels = gemini.enhance_cluster_labels(label_to_texts)
-    
-    label_summaries = {}
-    for cluster_id, enhanced_data in enhanced_labels.items():
-        label_summaries[cluster_id] = {
-            "keywords": enhanced_data["keywords"],
-            "label": enhanced_data["label"],
-            "description": enhanced_data.get("description", ""),
-            "sentiment": enhanced_data.get("sentiment", "neutral"),
-            "method": "gemini"
-        }
-    
-    return label_summaries
-
 # Fallback functions for Gemini analyzer
 def get_sentiment_batch(texts: List[str]) -> List[Dict[str, Any]]:
     """Get sentiment scores using Gemini batch processing (fallback)"""
@@ -122,16 +120,67 @@ def get_sentiment_batch(texts: List[str]) -> List[Dict[str, Any]]:
         return [{"sentiment": 0.0, "confidence": 0.0, "reasoning": "Gemini not available"} for _ in texts]
     
     gemini = get_analyzer()
-    results = gemini.analyze_sentiment_batch(texts)
+    return _sentiment_records(gemini.analyze_sentiment_batch(texts))
+
+def _sentiment_records(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Gemini sentiment results in the shape the fallback pipeline reports"""
     return [{
         "score": result["sentiment"],
         "confidence": result["confidence"],
         "reasoning": result["reasoning"],
-        "method": "gemini"
+        "method": result.get("method", "gemini")
     } for result in results]
 
-def auto_label_clusters(texts: List[str], labels: np.ndarray, top_k: int = 3) -> Dict[int, Dict[str, Any]]:
-    """Generate cluster labels using Gemini (fallback)"""
+def _sentiment_cache_key(text: str) -> str:
+    """Cache key for a cleaned text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def get_sentiment_batch_dedup(cleaned: List[str]) -> List[Dict[str, Any]]:
+    """Get sentiment once per unique cleaned text, reusing cached results"""
+    return _sentiment_dedup(cleaned, with_themes=False)[0]
+
+def get_sentiment_and_themes_dedup(cleaned: List[str], timeout: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """get_sentiment_batch_dedup plus the themes of the corpus, fused into one Gemini call"""
+    return _sentiment_dedup(cleaned, with_themes=True, timeout=timeout)
+
+def _sentiment_dedup(cleaned: List[str], with_themes: bool,
+                     timeout: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Sentiment per cleaned text via the on-disk cache, plus themes when requested"""
+    unique_index: Dict[str, int] = {}
+    inverse = [unique_index.setdefault(c, len(unique_index)) for c in cleaned]
+    unique_cleaned = list(unique_index)
+    
+    keys = [_sentiment_cache_key(c) for c in unique_cleaned]
+    cached = _sentiment_cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    
+    unique_results: List[Dict[str, Any]] = [cached.get(key) for key in keys]
+    themes = None
+    if missing:
+        # Cleaned text drops URLs and punctuation, cutting prompt tokens
+        if with_themes:
+            # Themes need every text anyway, so one call scores them all and
+            # the cached scores are kept for the texts that have one
+            sentiments, themes = get_analyzer().analyze_sentiment_and_themes(unique_cleaned, timeout)
+            fresh = _sentiment_records([sentiments[i] for i in missing])
+        else:
+            fresh = get_sentiment_batch([unique_cleaned[i] for i in missing])
+        for i, result in zip(missing, fresh):
+            unique_results[i] = result
+        # Persist only genuine Gemini scores: not placeholders from errors or an
+        # unavailable API, nor keyword-fallback results from a quota outage
+        _sentiment_cache.put_many({
+            keys[i]: r for i, r in zip(missing, fresh)
+            if r.get("method") == "gemini" and r.get("confidence", 0.0) > 0.0
+        })
+    elif with_themes:
+        themes = get_analyzer().extract_themes(unique_cleaned, timeout)
+    
+    return [unique_results[i] for i in inverse], themes
+
+def auto_label_clusters(texts: List[str], labels: np.ndarray, top_k: int = 3,
+                        timeout: Optional[float] = None) -> Dict[int, Dict[str, Any]]:
+    """Generate cluster labels using Gemini within timeout seconds (fallback)"""
     if not GEMINI_AVAILABLE:
         return {}
     
@@ -139,7 +188,7 @@ def auto_label_clusters(texts: List[str], labels: np.ndarray, top_k: int = 3) ->
     label_to_texts = {int(l): df[df.label == l]["text"].tolist() for l in sorted(df.label.unique())}
     
     gemini = get_analyzer()
-    enhanced_labels = gemini.enhance_cluster_labels(label_to_texts)
+    enhanced_labels = gemini.enhance_cluster_labels(label_to_texts, timeout)
     
     label_summaries = {}
     for cluster_id, enhanced_data in enhanced_labels.items():
@@ -153,21 +202,35 @@ def auto_label_clusters(texts: List[str], labels: np.ndarray, top_k: int = 3) ->
     
     return label_summaries
 
+def loads_json(data):
+    """Parse JSON from str or bytes (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps_json(obj: Any) -> bytes:
+    """Serialize an analysis result to UTF-8 JSON bytes (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj).encode("utf-8")
+
 def clean_text(text: str) -> str:
     """Clean and normalize text"""
     if not isinstance(text, str):
         return ""
-    text = text.lower()
-    text = re.sub(r"https?://\S+", " ", text)
-    text = re.sub(r"[^a-z0-9\s]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
-
-def get_embeddings(texts: List[str]) -> np.ndarray:
-    """Get embeddings using TF-IDF"""
-    vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-    tfidf_matrix = vectorizer.fit_transform(texts)
-    return tfidf_matrix.toarray()
+    text = _URL_RE.sub(" ", text.lower())
+    return _NON_ALNUM_RE.sub(" ", text).strip()
+
+def clean_texts(texts: List[str]) -> List[str]:
+    """Clean a list of texts"""
+    # Serial on purpose: two regex passes cost ~2.5 us per text, far less than
+    # shipping texts to a process pool, and each gunicorn worker spawning one
+    # pool per core would oversubscribe the host
+    return [clean_text(t) for t in texts]
+
+def get_embeddings(texts: List[str]) -> csr_matrix:
+    """Get sparse hashed bag-of-words embeddings (CSR; KMeans accepts sparse input)"""
+    return _vectorizer.transform(texts)
 
 def compute_roi(volume: int, max_volume: int, avg_sentiment: float, weight: float = 1.0) -> float:
     """Compute ROI score based on volume and sentiment"""
@@ -178,12 +241,20 @@ def compute_roi(volume: int, max_volume: int, avg_sentiment: float, weight: floa
     roi = volume_score * sentiment_score * max(weight, 0.1)
     return round(float(roi) * 100.0, 2)
 
+def compute_roi_vec(volumes: np.ndarray, avg_sentiments: np.ndarray, max_volume: int, weight: float = 1.0) -> np.ndarray:
+    """Compute ROI scores for all clusters at once (vectorized compute_roi)"""
+    if max_volume <= 0:
+        return np.zeros(len(volumes))
+    volume_scores = volumes / float(max_volume)
+    sentiment_scores = (avg_sentiments + 1.0) / 2.0  # map [-1,1] -> [0,1]
+    return np.round(volume_scores * sentiment_scores * max(weight, 0.1) * 100.0, 2)
+
 def analyze_feedback(feedbacks: List[str], n_clusters: int = 5) -> Dict[str, Any]:
     """Main analysis function - uses hybrid approach for efficiency"""
     if len(feedbacks) == 0:
         return {"items": [], "clusters": [], "insights": [], "themes": []}
     
-    # Use hybrid analyzer if available (2 LLM calls max)
+    # Use hybrid analyzer if available (1 LLM call max)
     if HYBRID_AVAILABLE:
         print(f"Using hybrid analyzer for {len(feedbacks)} feedback items", file=sys.stderr)
         return analyze_feedback_hybrid(feedbacks, n_clusters)
@@ -197,38 +268,60 @@ def analyze_feedback_gemini_fallback(feedbacks: List[str], n_clusters: int = 5)
     if len(feedbacks) == 0:
         return {"items": [], "clusters": [], "insights": [], "themes": []}
     
-    cleaned = [clean_text(t) for t in feedbacks]
-    
-    # Get embeddings for clustering
-    embeddings = get_embeddings(cleaned)
-    
-    # Cluster
-    n_clusters = min(n_clusters, len(feedbacks))
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    labels = kmeans.fit_predict(embeddings)
-    
-    # Get sentiments using Gemini batch processing
-    sentiment_results = get_sentiment_batch(feedbacks)
-    sentiments = [result["score"] for result in sentiment_results]
+    # Only use Gemini enhancements for smaller datasets to avoid timeouts
+    enhance = len(feedbacks) <= 100
+    # Every Gemini call below shares one budget, so the request as a whole
+    # stays under gunicorn's worker timeout
+    deadline = time.monotonic() + GEMINI_CALL_BUDGET_SECONDS
     
-    # Create results
-    df = pd.DataFrame({
-        "text": feedbacks,
-        "clean": cleaned,
-        "cluster": labels,
-        "sentiment": sentiments,
-        "sentiment_details": sentiment_results,
-    })
+    with ThreadPoolExecutor(max_workers=GEMINI_MAX_WORKERS) as executor:
+        cleaned = clean_texts(feedbacks)
+        
+        # Sentiment and themes don't depend on clustering, so start them first
+        # and let the Gemini round-trip overlap the KMeans fit; with themes
+        # wanted, both come from one fused call
+        if enhance:
+            sentiment_future = executor.submit(get_sentiment_and_themes_dedup, cleaned, GEMINI_CALL_BUDGET_SECONDS)
+        else:
+            sentiment_future = executor.submit(_sentiment_dedup, cleaned, False)
+        
+        # Cluster (skipping TF-IDF + KMeans when the result is trivial)
+        n_clusters = min(n_clusters, len(feedbacks))
+        if n_clusters >= len(feedbacks):
+            labels = np.arange(len(feedbacks), dtype=np.int32)
+        elif len(feedbacks) < MIN_ITEMS_FOR_CLUSTERING:
+            n_clusters = 1
+            labels = np.zeros(len(feedbacks), dtype=np.int32)
+        else:
+            embeddings = get_embeddings(cleaned)
+            if HAS_GPU and len(feedbacks) >= GPU_KMEANS_MIN_ITEMS:
+                # cuML needs dense input; float32 halves the host->device copy
+                kmeans = KMeansGPU(n_clusters=n_clusters, n_init=1, random_state=42)
+                labels = np.asarray(kmeans.fit_predict(embeddings.astype(np.float32).toarray()), dtype=np.int32)
+            else:
+                kmeans = MiniBatchKMeans(
+                    n_clusters=n_clusters, random_state=42, init='k-means++', n_init=1,
+                    batch_size=256, max_iter=100, tol=1e-3,
+                )
+                labels = kmeans.fit_predict(embeddings)
+        
+        # Label enhancement can start as soon as cluster assignments exist
+        label_future = executor.submit(auto_label_clusters, cleaned, labels, 3, deadline - time.monotonic())
+        
+        sentiment_results, themes_result = sentiment_future.result()
+        sentiments = [result["score"] for result in sentiment_results]
+        label_info = label_future.result()
     
     summaries = []
-    label_info = auto_label_clusters(cleaned, labels, top_k=3)
-    max_volume = df.groupby("cluster").size().max()
+    volumes = np.bincount(labels, minlength=n_clusters)
+    sent_sums = np.bincount(labels, weights=np.asarray(sentiments, dtype=np.float64), minlength=n_clusters)
+    avg_sents = sent_sums / np.maximum(volumes, 1)
+    rois = compute_roi_vec(volumes, avg_sents, max_volume=int(volumes.max()), weight=1.0)
     
-    for cluster_id, group in df.groupby("cluster"):
-        volume = int(group.shape[0])
-        avg_sent = float(group["sentiment"].mean()) if volume > 0 else 0.0
+    for cluster_id, volume, avg_sent, roi in zip(range(n_clusters), volumes.tolist(), avg_sents.tolist(), rois.tolist()):
+        if volume == 0:
+            continue
         label_meta = label_info.get(int(cluster_id), {"label": f"Cluster {int(cluster_id)}", "keywords": []})
-        roi = compute_roi(volume=volume, max_volume=int(max_volume), avg_sentiment=avg_sent, weight=1.0)
         
         cluster_summary = {
             "cluster": int(cluster_id),
@@ -244,23 +337,26 @@ def analyze_feedback_gemini_fallback(feedbacks: List[str], n_clusters: int = 5)
         
         summaries.append(cluster_summary)
     
-    items = df.to_dict(orient="records")
+    # Build per-item results in one pass (no DataFrame round-trip)
+    items = [
+        {"text": t, "clean": c, "cluster": l, "sentiment": float(s), "sentiment_details": d}
+        for t, c, l, s, d in zip(feedbacks, cleaned, labels.tolist(), sentiments, sentiment_results)
+    ]
     summaries = sorted(summaries, key=lambda s: s["roi"], reverse=True)
     
     # Prepare result
     result = {"items": items, "clusters": summaries}
     
     # Add Gemini enhancements (only for reasonable dataset sizes)
-    if len(feedbacks) <= 100:  # Only use Gemini for smaller datasets to avoid timeouts
-        gemini = get_gemini()
+    if enhance:
+        gemini = get_analyzer()
         
-        # Extract themes
-        themes_result = gemini.extract_themes(feedbacks)
+        # Themes came with the sentiment, concurrently with clustering
         result["themes"] = themes_result.get("themes", [])
         result["theme_summary"] = themes_result.get("summary", "")
         
         # Generate insights
-        insights_result = gemini.generate_insights(result)
+        insights_result = gemini.generate_insights(result, deadline - time.monotonic())
         result["insights"] = insights_result.get("insights", [])
         result["recommendations"] = insights_result.get("recommendations", [])
         result["priority_areas"] = insights_result.get("priority_areas", [])
@@ -277,22 +373,24 @@ def analyze_feedback_gemini_fallback(feedbacks: List[str], n_clusters: int = 5)
 def main():
     """Main entry point for command line usage"""
     if len(sys.argv) < 3:
-        print("Usage: python analyze.py '<json_texts>' <n_clusters>", file=sys.stderr)
+        print("Usage: python analyze.py '<json_texts>' | - | @<path> <n_clusters>", file=sys.stderr)
         sys.exit(1)
     
     try:
-        # Handle the case where quotes might be stripped by shell
-        json_str = sys.argv[1]
-        if not json_str.startswith('['):
-            json_str = '[' + json_str
-        if not json_str.endswith(']'):
-            json_str = json_str + ']'
-        
-        texts = json.loads(json_str)
+        # '-' reads JSON from stdin and '@path' from a file, which avoids argv
+        # size limits and shell quoting for large inputs
+        source = sys.argv[1]
+        if source == '-':
+            texts = loads_json(sys.stdin.buffer.read())
+        elif source.startswith('@'):
+            with open(source[1:], 'rb') as f:
+                texts = loads_json(f.read())
+        else:
+            texts = loads_json(source)
         n_clusters = int(sys.argv[2])
         
         result = analyze_feedback(texts, n_clusters)
-        print(json.dumps(result))
+        sys.stdout.buffer.write(dumps_json(result) + b"\n")
         
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
@@ -13,7 +13,7 @@ import os
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from analyze import analyze_feedback
+from analyze import analyze_feedback, dumps_json
 
 app = Flask(__name__)
 CORS(app)
@@ -71,12 +71,13 @@ def analyze():
         # Perform analysis using Gemini
         result = analyze_feedback(texts, n_clusters)
         
-        return jsonify(result)
+        return app.response_class(dumps_json(result), mimetype='application/json')
         
     except Exception as e:
         print(f"Analysis error: {e}", file=sys.stderr)
         return jsonify({"error": f"Analysis failed: {str(e)}"}), 500
 
 if __name__ == '__main__':
+    # Development server only; production runs under gunicorn (see wsgi.py)
     print("Starting AI Feedback Miner Brain Service...")
     app.run(host='0.0.0.0', port=5000, debug=False)
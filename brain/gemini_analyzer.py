@@ -5,37 +5,531 @@ Provides advanced text analysis using Google's Gemini API
 """
 
 import os
+import re
 import json
 import sys
-from typing import List, Dict, Any, Optional
+import textwrap
+import asyncio
+import copy
+import hashlib
+import importlib.util
+import threading
+import time
+import queue
+import random
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
-# Try to import Gemini
+import numpy as np
+
+# Gemini SDK, imported on first use so callers that never reach Gemini
+# don't pay its import cost
+@lru_cache(maxsize=1)
+def _genai_mod():
+    """Return the google.genai module, or None when it isn't installed"""
+    try:
+        from google import genai
+    except ImportError:
+        print("Warning: google-genai not available", file=sys.stderr)
+        return None
+    return genai
+
+# Fast JSON (optional)
 try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    GEMINI_AVAILABLE = False
-    print("Warning: google-generativeai not available", file=sys.stderr)
+    ORJSON_AVAILABLE = False
+
+MODEL_NAME = 'gemini-1.5-flash'
+
+# Semantic sentiment cache (optional, off unless SEMANTIC_CACHE_ENABLED is
+# set): paraphrased feedback reuses the sentiment of a previously scored
+# neighbour instead of re-asking Gemini. Near-identical embeddings can still
+# disagree on negation ("works" / "doesn't work"), hence the opt-in and the
+# strict default threshold. Only presence is checked here; sentence-transformers
+# pulls in torch, so both are imported when the cache is first built
+SEMANTIC_CACHE_AVAILABLE = all(
+    importlib.util.find_spec(name) is not None for name in ("faiss", "sentence_transformers")
+)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "").lower() in ("1", "true", "yes")
+
+SEMANTIC_CACHE_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+SEMANTIC_CACHE_MAX_ENTRIES = 50000
+
+# Parsed-response cache: identical prompts skip the API entirely
+CACHE_MAX_ENTRIES = 1024
+CACHE_TTL_SECONDS = 3600
+
+# Memoized analyze_sentiment_batch results, keyed by the exact batch
+BATCH_CACHE_MAX_ENTRIES = 512
+
+# Structured-output schemas: with response_mime_type JSON the reply is bare
+# JSON in this shape, so no markdown fences need stripping
+_SENTIMENT_LABEL_SCHEMA = {"type": "STRING", "enum": ["positive", "negative", "neutral"]}
+_RESPONSE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "sentiment": {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {
+                "sentiment": {"type": "NUMBER"},
+                "confidence": {"type": "NUMBER"},
+                "reasoning": {"type": "STRING"},
+            },
+            "required": ["sentiment", "confidence", "reasoning"],
+        },
+    },
+    "themes": {
+        "type": "OBJECT",
+        "properties": {
+            "themes": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "name": {"type": "STRING"},
+                        "keywords": {"type": "ARRAY", "items": {"type": "STRING"}},
+                        "description": {"type": "STRING"},
+                        "sentiment": _SENTIMENT_LABEL_SCHEMA,
+                    },
+                    "required": ["name", "keywords", "description", "sentiment"],
+                },
+            },
+            "summary": {"type": "STRING"},
+        },
+        "required": ["themes", "summary"],
+    },
+    "insights": {
+        "type": "OBJECT",
+        "properties": {
+            "insights": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "recommendations": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "action": {"type": "STRING"},
+                        "priority": {"type": "STRING", "enum": ["high", "medium", "low"]},
+                        "impact": {"type": "STRING"},
+                    },
+                    "required": ["action", "priority", "impact"],
+                },
+            },
+            "priority_areas": {"type": "ARRAY", "items": {"type": "STRING"}},
+        },
+        "required": ["insights", "recommendations", "priority_areas"],
+    },
+    "cluster_label": {
+        "type": "OBJECT",
+        "properties": {
+            "label": {"type": "STRING"},
+            "keywords": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "sentiment": _SENTIMENT_LABEL_SCHEMA,
+            "description": {"type": "STRING"},
+        },
+        "required": ["label", "keywords", "sentiment", "description"],
+    },
+}
+
+# Fused sentiment + themes reply: the per-text sentiment array alongside the themes fields
+_RESPONSE_SCHEMAS["sentiment_and_themes"] = {
+    "type": "OBJECT",
+    "properties": {"sentiments": _RESPONSE_SCHEMAS["sentiment"], **_RESPONSE_SCHEMAS["themes"]["properties"]},
+    "required": ["sentiments", "themes", "summary"],
+}
+
+def json_config(schema: Optional[Dict[str, Any]] = None, service_tier: Optional[str] = None):
+    """Generation config asking Gemini for JSON (following schema when given) on a service tier"""
+    return _genai_mod().types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=schema,
+        service_tier=service_tier or None,
+    )
+
+# Prompt templates, filled in with str.format (literal braces are doubled)
+_PROMPT_SENTIMENT = textwrap.dedent("""\
+    Analyze the sentiment of these customer feedback texts. For each text, provide:
+    1. Sentiment score (-1 to 1, where -1 is very negative, 0 is neutral, 1 is very positive)
+    2. Confidence level (0 to 1)
+    3. Brief reasoning for your analysis
+
+    Texts:
+    {combined_texts}
+
+    Respond ONLY in JSON format with an array of results:
+    [
+        {{
+            "sentiment": <score>,
+            "confidence": <confidence>,
+            "reasoning": "<brief explanation>"
+        }}
+    ]
+""")
+
+_PROMPT_THEMES = textwrap.dedent("""\
+    Analyze these customer feedback texts and identify the main themes/topics.
+    Provide:
+    1. List of main themes (3-7 themes)
+    2. For each theme, provide keywords and brief description
+    3. Overall summary of customer sentiment patterns
+
+    Feedback texts:
+    {combined_texts}
+
+    Respond ONLY in JSON format:
+    {{
+        "themes": [
+            {{
+                "name": "<theme_name>",
+                "keywords": ["keyword1", "keyword2"],
+                "description": "<brief description>",
+                "sentiment": "<positive/negative/neutral>"
+            }}
+        ],
+        "summary": "<overall summary>"
+    }}
+""")
+
+_PROMPT_SENTIMENT_AND_THEMES = textwrap.dedent("""\
+    Analyze these customer feedback texts and complete both tasks below.
+    1. Sentiment: for each text, in order, give a sentiment score (-1 to 1, where -1 is very negative, 0 is neutral, 1 is very positive), a confidence level (0 to 1) and brief reasoning
+    2. Themes: identify 3-7 main themes with keywords, a brief description and their sentiment, plus an overall summary of customer sentiment patterns
+
+    Texts:
+    {combined_texts}
+
+    Respond ONLY in JSON format:
+    {{
+        "sentiments": [
+            {{
+                "sentiment": <score>,
+                "confidence": <confidence>,
+                "reasoning": "<brief explanation>"
+            }}
+        ],
+        "themes": [
+            {{
+                "name": "<theme_name>",
+                "keywords": ["keyword1", "keyword2"],
+                "description": "<brief description>",
+                "sentiment": "<positive/negative/neutral>"
+            }}
+        ],
+        "summary": "<overall summary>"
+    }}
+""")
+
+_PROMPT_INSIGHTS = textwrap.dedent("""\
+    Based on this customer feedback analysis data, provide:
+    1. Key insights about customer satisfaction
+    2. Actionable recommendations for improvement
+    3. Priority areas to focus on
+
+    Analysis Data:
+    {analysis_data}
+
+    Respond ONLY in JSON format:
+    {{
+        "insights": [
+            "<insight 1>",
+            "<insight 2>"
+        ],
+        "recommendations": [
+            {{
+                "action": "<specific action>",
+                "priority": "<high/medium/low>",
+                "impact": "<expected impact>"
+            }}
+        ],
+        "priority_areas": ["<area 1>", "<area 2>"]
+    }}
+""")
+
+_PROMPT_CLUSTER_LABEL = textwrap.dedent("""\
+    Analyze these customer feedback texts from a cluster and provide:
+    1. A descriptive label for this cluster
+    2. Key keywords that represent this cluster
+    3. The main sentiment/tone of this cluster
+
+    Sample feedback texts:
+    {combined_sample}
+
+    Respond ONLY in JSON format:
+    {{
+        "label": "<descriptive cluster name>",
+        "keywords": ["keyword1", "keyword2", "keyword3"],
+        "sentiment": "<positive/negative/neutral>",
+        "description": "<brief description of what this cluster represents>"
+    }}
+""")
+
+# Cap on concurrent in-flight Gemini requests (free tier allows 15 RPM)
+MAX_CONCURRENCY = 8
+
+# Keep-alive connections held open per API key's HTTP/2 pool
+MAX_KEEPALIVE_CONNECTIONS = 32
+
+# One client (and connection pool) per API key, shared by every analyzer
+_CLIENTS: Dict[str, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def _get_client(api_key: str):
+    """Return the shared genai.Client for api_key, creating it on first use"""
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(api_key)
+        if client is None:
+            import httpx
+            
+            genai = _genai_mod()
+            # httpx transport over HTTP/2 for the async client; the SDK's
+            # default async transport adds heavy per-request overhead
+            transport = httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS),
+            )
+            client = genai.Client(
+                api_key=api_key,
+                http_options=genai.types.HttpOptions(async_client_args={"transport": transport}),
+            )
+            _CLIENTS[api_key] = client
+        return client
+
+# Texts per sentiment request; larger batches are split and sent concurrently
+SENTIMENT_CHUNK_SIZE = 50
+
+# JSON extraction from replies: a markdown-fenced block, else the outermost object/array
+_FENCE_RE = re.compile(r"```(?:json)?\s*(\{.*?\}|\[.*?\])\s*```", re.S)
+_OBJ_RE = re.compile(r"(\{.*\}|\[.*\])", re.S)
+
+# Per-key request quota enforced client-side (default: the free tier's 15
+# RPM). Every gunicorn worker process draws on the same key, so each one gets
+# an equal share of it. Plus retry schedules for 429s (exponential backoff
+# with jitter) and for malformed JSON replies (short fixed delay)
+RATE_LIMIT_REQUESTS = float(os.getenv("GEMINI_RATE_LIMIT_REQUESTS", "15"))
+RATE_LIMIT_PERIOD = float(os.getenv("GEMINI_RATE_LIMIT_PERIOD", "60"))
+WORKER_PROCESSES = max(1, int(os.getenv("BRAIN_WORKERS", "1")))
+RETRY_ATTEMPTS = 5
+RETRY_BACKOFF_INITIAL = 2.0
+RETRY_BACKOFF_MAX = 32.0
+PARSE_RETRY_DELAY = 0.5
+
+# Wall-clock budget for a synchronous Gemini entry point, retries and backoff
+# included, kept well under gunicorn's 120 s worker timeout
+GEMINI_CALL_BUDGET_SECONDS = 90.0
+
+_RETRY_DELAY_RE = re.compile(r"""retryDelay['"]?\s*:\s*['"]?(\d+(?:\.\d+)?)s""")
+
+# All Gemini traffic runs on one background event loop so the async HTTP
+# connection pool survives between calls made from synchronous code
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Start the shared event loop thread on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="gemini-event-loop", daemon=True).start()
+    return _loop
+
+def _run_async(coro, timeout: Optional[float] = None):
+    """Run a coroutine on the shared event loop and wait for its result
+    
+    With a timeout the coroutine is cancelled after that many seconds
+    (TimeoutError).
+    """
+    if timeout is None:
+        return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+    timeout = max(timeout, 0.0)
+    try:
+        return asyncio.run_coroutine_threadsafe(asyncio.wait_for(coro, timeout), _get_loop()).result()
+    except TimeoutError:
+        raise TimeoutError(f"Gemini call exceeded its {timeout:.0f}s budget") from None
+
+def _budget(timeout: Optional[float]) -> float:
+    """Seconds a synchronous Gemini call may take (GEMINI_CALL_BUDGET_SECONDS unless given)"""
+    return GEMINI_CALL_BUDGET_SECONDS if timeout is None else timeout
+
+def _loads_json(data):
+    """Parse JSON text (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _dumps_json_compact(obj: Any) -> str:
+    """Serialize to whitespace-free JSON text for embedding in prompts (indentation costs tokens)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"))
+
+class _AsyncRateLimiter:
+    """Token bucket allowing `rate` acquisitions per `period` seconds on the shared loop"""
+    
+    def __init__(self, rate: float, period: float):
+        # A fractional share of the quota still needs room for one request
+        self.capacity = max(1.0, rate)
+        self.refill_per_second = rate / period
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+    
+    async def acquire(self) -> None:
+        """Wait until a request slot is free and take it"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Holding the lock while sleeping keeps waiters in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.refill_per_second)
+
+_rate_limiter = _AsyncRateLimiter(RATE_LIMIT_REQUESTS / WORKER_PROCESSES, RATE_LIMIT_PERIOD)
+
+class _UncachedBatch(Exception):
+    """Carries degraded batch results out of the lru_cache so they aren't memoized"""
+    
+    def __init__(self, results: List[Dict[str, Any]]):
+        super().__init__("incomplete sentiment batch")
+        self.results = results
+
+def _dedupe(texts: List[str]) -> Tuple[List[str], List[int]]:
+    """Distinct texts in first-seen order, plus each input's position among them"""
+    positions: Dict[str, int] = {}
+    index = [positions.setdefault(text, len(positions)) for text in texts]
+    return list(positions), index
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    """True for Gemini 429 / RESOURCE_EXHAUSTED errors"""
+    return getattr(error, "code", None) == 429 or "RESOURCE_EXHAUSTED" in str(error)
+
+def _backoff_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retrying a rate-limited call, preferring the server's retryDelay"""
+    match = _RETRY_DELAY_RE.search(str(getattr(error, "details", None) or error))
+    if match:
+        return min(RETRY_BACKOFF_MAX, float(match.group(1)))
+    return min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_INITIAL * 2 ** attempt + random.uniform(0, 1))
+
+class _JsonObjectStream:
+    """Incrementally extracts complete top-level JSON objects from streamed text"""
+    
+    def __init__(self):
+        self._buf: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+    
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume a chunk and return any objects whose closing brace it contained"""
+        objects = []
+        for ch in chunk:
+            if not self._depth:
+                # Skip array brackets, commas and markdown between objects
+                if ch == "{":
+                    self._depth = 1
+                    self._buf = [ch]
+                continue
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if not self._depth:
+                    objects.append(_loads_json("".join(self._buf)))
+        return objects
+
+class SemanticCache:
+    """Nearest-neighbour cache of sentiment results over normalized sentence embeddings"""
+    
+    def __init__(self, model_name: str = SEMANTIC_CACHE_MODEL, threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        import faiss
+        from sentence_transformers import SentenceTransformer
+        
+        self.encoder = SentenceTransformer(model_name)
+        self.threshold = threshold
+        self.index = faiss.IndexFlatIP(self.encoder.get_sentence_embedding_dimension())
+        self.results: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+    
+    def encode(self, texts: List[str]) -> "np.ndarray":
+        """Embed texts in one batch; inner product on these equals cosine similarity"""
+        embeddings = self.encoder.encode(texts, batch_size=64, normalize_embeddings=True)
+        return np.asarray(embeddings, dtype=np.float32)
+    
+    def lookup(self, embeddings: "np.ndarray") -> List[Optional[Dict[str, Any]]]:
+        """Return the cached result for each embedding, or None when no neighbour is close enough"""
+        with self._lock:
+            if self.index.ntotal == 0:
+                return [None] * len(embeddings)
+            scores, ids = self.index.search(embeddings, 1)
+            return [
+                dict(self.results[idx]) if score >= self.threshold else None
+                for score, idx in zip(scores[:, 0].tolist(), ids[:, 0].tolist())
+            ]
+    
+    def add(self, embeddings: "np.ndarray", results: List[Dict[str, Any]]) -> None:
+        """Remember results for the given embeddings"""
+        if not results:
+            return
+        with self._lock:
+            if self.index.ntotal + len(results) > SEMANTIC_CACHE_MAX_ENTRIES:
+                # A flat index can't evict individual vectors; start over instead
+                self.index.reset()
+                self.results = []
+            self.index.add(embeddings)
+            self.results.extend(dict(r) for r in results)
 
 class GeminiAnalyzer:
     """Enhanced analyzer using Google's Gemini API"""
     
+    # Keyword lists for the offline fallback; each alternation finds every
+    # keyword in one C-level scan (substring matches, like `word in text`)
+    _POSITIVE_WORDS = ['great', 'amazing', 'excellent', 'love', 'best', 'good', 'wonderful', 'fantastic', 'awesome', 'perfect']
+    _NEGATIVE_WORDS = ['terrible', 'awful', 'bad', 'hate', 'worst', 'poor', 'disappointed', 'horrible', 'useless', 'waste']
+    _POS_RE = re.compile("|".join(_POSITIVE_WORDS))
+    _NEG_RE = re.compile("|".join(_NEGATIVE_WORDS))
+    # Below this many texts the plain loop beats building a sparse matrix
+    _FALLBACK_VECTORIZE_MIN_ITEMS = 8
+    
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
-        self.model = None
+        self.client = None
         self.available = False
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._semantic_cache: Optional[SemanticCache] = None
+        self._semantic_cache_enabled = SEMANTIC_CACHE_ENABLED
+        # Per-instance memo of whole sentiment batches keyed by tuple(texts)
+        self._sentiment_batch_cache = lru_cache(maxsize=BATCH_CACHE_MAX_ENTRIES)(self._analyze_sentiment_tuple)
+        # Keyword presence vectorizer for the fallback, built on first large batch
+        self._fallback_vec = None
         
-        if GEMINI_AVAILABLE and self.api_key:
+        genai = _genai_mod() if self.api_key else None
+        if genai is not None:
             try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel('gemini-1.5-flash')
+                self.client = _get_client(self.api_key)
                 self.available = True
                 print("Gemini API initialized successfully", file=sys.stderr)
             except Exception as e:
                 print(f"Warning: Could not initialize Gemini API: {e}", file=sys.stderr)
         else:
-            if not GEMINI_AVAILABLE:
-                print("Warning: Gemini library not installed", file=sys.stderr)
             if not self.api_key:
                 print("Warning: GEMINI_API_KEY environment variable not set", file=sys.stderr)
     
@@ -44,160 +538,387 @@ class GeminiAnalyzer:
         if not response_text:
             raise ValueError("Empty response from Gemini API")
         
-        # Try to extract JSON from the response if it's wrapped in markdown or other text
-        if response_text.startswith("```json"):
-            # Extract JSON from markdown code block
-            start = response_text.find("```json") + 7
-            end = response_text.find("```", start)
-            if end != -1:
-                response_text = response_text[start:end].strip()
-        elif response_text.startswith("```"):
-            # Extract JSON from generic code block
-            start = response_text.find("```") + 3
-            end = response_text.find("```", start)
-            if end != -1:
-                response_text = response_text[start:end].strip()
-        
-        # Try to find JSON object in the response
-        if not response_text.startswith("{"):
-            # Look for JSON object in the response
-            start = response_text.find("{")
-            end = response_text.rfind("}") + 1
-            if start != -1 and end > start:
-                response_text = response_text[start:end]
+        # JSON mode replies are bare JSON; the regexes only cover replies that
+        # ignored it (fenced block, else the outermost object/array)
+        try:
+            return _loads_json(response_text)
+        except ValueError:
+            pass
         
-        if not response_text:
+        match = _FENCE_RE.search(response_text) or _OBJ_RE.search(response_text)
+        if not match:
             raise ValueError("No JSON found in Gemini API response")
         
         try:
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
+            return _loads_json(match.group(1))
+        except ValueError as e:
             raise ValueError(f"Invalid JSON in Gemini API response: {e}")
     
+    def _cache_key(self, prompt: str, config: Optional[Any] = None) -> str:
+        """Cache key for a prompt (and generation config) sent to this analyzer's model"""
+        settings = config.model_dump_json(exclude_none=True) if config is not None else ""
+        return hashlib.sha256(f"{MODEL_NAME}|{settings}|{prompt}".encode("utf-8")).hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[Any]:
+        """Return a copy of a fresh cached result, or None on miss/expiry"""
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            timestamp, value = entry
+            if time.monotonic() - timestamp > CACHE_TTL_SECONDS:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+        # Callers may mutate results (e.g. padding lists), so never hand out the cached object
+        return copy.deepcopy(value)
+    
+    def _cache_put(self, key: str, value: Any) -> None:
+        """Store a parsed result, evicting the least recently used entry when full"""
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), copy.deepcopy(value))
+            self._cache.move_to_end(key)
+            while len(self._cache) > CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+    
+    def _call_gemini(self, prompt: str, config: Optional[Any] = None,
+                     attempts: int = RETRY_ATTEMPTS, timeout: Optional[float] = None) -> Any:
+        """Send a prompt to Gemini and parse the JSON reply, serving repeats from cache
+        
+        timeout (default GEMINI_CALL_BUDGET_SECONDS) bounds the whole call,
+        retries and backoff included (TimeoutError when exceeded).
+        """
+        return _run_async(self._call_gemini_async(prompt, config, attempts), _budget(timeout))
+    
+    async def _call_gemini_async(self, prompt: str, config: Optional[Any] = None,
+                                 attempts: int = RETRY_ATTEMPTS) -> Any:
+        """Async variant of _call_gemini sharing the same cache"""
+        key = self._cache_key(prompt, config)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            await _rate_limiter.acquire()
+            try:
+                response = await self.client.aio.models.generate_content(model=MODEL_NAME, contents=prompt, config=config)
+                result = self._parse_gemini_response(response.text.strip() if response.text else "")
+            except ValueError:
+                # Malformed JSON (JSONDecodeError is a ValueError): ask again quickly
+                if last_attempt:
+                    raise
+                await asyncio.sleep(PARSE_RETRY_DELAY)
+                continue
+            except Exception as e:
+                if last_attempt or not _is_rate_limit_error(e):
+                    raise
+                await asyncio.sleep(_backoff_delay(e, attempt))
+                continue
+            self._cache_put(key, result)
+            return result
+    
+    def _get_semantic_cache(self) -> Optional[SemanticCache]:
+        """Create the semantic cache on first use (loads the embedding model)"""
+        if self._semantic_cache is None and self._semantic_cache_enabled:
+            if not SEMANTIC_CACHE_AVAILABLE:
+                print("Warning: sentence-transformers/faiss not available, semantic cache disabled", file=sys.stderr)
+                self._semantic_cache_enabled = False
+                return None
+            try:
+                self._semantic_cache = SemanticCache()
+            except Exception as e:
+                print(f"Warning: Could not initialize semantic cache: {e}", file=sys.stderr)
+                self._semantic_cache_enabled = False
+        return self._semantic_cache
+    
     def analyze_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
         """Batch sentiment analysis using Gemini for better performance"""
         if not self.available:
             return [{"sentiment": 0.0, "confidence": 0.0, "reasoning": "Gemini not available"} for _ in texts]
         
+        # Identical batches are answered from memory; copies keep callers
+        # from mutating the memoized results
         try:
-            # Combine texts for batch analysis
-            combined_texts = "\n".join([f"{i+1}. {text}" for i, text in enumerate(texts)])
-            
-            prompt = f"""
-            Analyze the sentiment of these customer feedback texts. For each text, provide:
-            1. Sentiment score (-1 to 1, where -1 is very negative, 0 is neutral, 1 is very positive)
-            2. Confidence level (0 to 1)
-            3. Brief reasoning for your analysis
-            
-            Texts:
-            {combined_texts}
-            
-            Respond ONLY in JSON format with an array of results:
-            [
-                {{
-                    "sentiment": <score>,
-                    "confidence": <confidence>,
-                    "reasoning": "<brief explanation>"
-                }}
-            ]
-            """
-            
-            response = self.model.generate_content(prompt)
-            result = self._parse_gemini_response(response.text.strip() if response.text else "")
-            
-            # Ensure we have the right number of results
-            if isinstance(result, list):
-                results = result
-            else:
-                # If single result, duplicate it for all texts
-                results = [result] * len(texts)
-            
-            # Pad or truncate to match input length
-            while len(results) < len(texts):
-                results.append({"sentiment": 0.0, "confidence": 0.0, "reasoning": "No analysis available"})
-            
-            return results[:len(texts)]
+            results = self._sentiment_batch_cache(tuple(texts))
+        except _UncachedBatch as e:
+            results = e.results
+        return [dict(result) for result in results]
+    
+    def _analyze_sentiment_tuple(self, texts: Tuple[str, ...]) -> Tuple[Dict[str, Any], ...]:
+        """Uncached body of analyze_sentiment_batch; raises _UncachedBatch for degraded results"""
+        # Score each distinct text once and fan results back out by position
+        unique, index = _dedupe(texts)
+        results, complete = self._analyze_unique_sentiments(unique)
+        if len(unique) < len(texts):
+            results = [results[i] for i in index]
+        if not complete:
+            raise _UncachedBatch(results)
+        return tuple(results)
+    
+    def cache_clear(self) -> None:
+        """Forget memoized sentiment batches and cached Gemini responses"""
+        self._sentiment_batch_cache.cache_clear()
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def _analyze_unique_sentiments(self, texts: List[str]) -> Tuple[List[Dict[str, Any]], bool]:
+        """Sentiment for already-deduplicated texts, via the semantic cache and Gemini
+        
+        Also reports whether every text got a real score (no errors or padding).
+        """
+        # Reuse results for texts semantically close to ones already scored;
+        # only the misses are sent to Gemini
+        semantic_cache = self._get_semantic_cache() if texts else None
+        if semantic_cache is not None:
+            embeddings = semantic_cache.encode(texts)
+            results = semantic_cache.lookup(embeddings)
+        else:
+            embeddings = None
+            results = [None] * len(texts)
+        misses = [i for i, result in enumerate(results) if result is None]
+        if not misses:
+            return results, True
+        miss_texts = [texts[i] for i in misses]
+        
+        try:
+            fresh = self._request_sentiment_batch(miss_texts)
+            # Padding placeholders for texts Gemini skipped aren't real scores
+            scored = [j for j, result in enumerate(fresh) if result.get("confidence", 0.0) > 0.0]
+            complete = len(scored) == len(fresh)
+            if semantic_cache is not None:
+                semantic_cache.add(embeddings[[misses[j] for j in scored]], [fresh[j] for j in scored])
             
         except Exception as e:
-            error_msg = str(e)
-            print(f"Gemini batch sentiment analysis error: {error_msg}", file=sys.stderr)
-            
-            # Check if it's a quota/rate limit error
-            if "quota" in error_msg.lower() or "rate" in error_msg.lower() or "limit" in error_msg.lower():
-                print("Gemini API quota/rate limit exceeded. Using fallback sentiment analysis.", file=sys.stderr)
-                return self._fallback_sentiment_analysis(texts)
+            print(f"Gemini batch sentiment analysis error: {e}", file=sys.stderr)
+            complete = False
+            fresh = self._sentiment_error_results(miss_texts, e)
+        
+        for i, result in zip(misses, fresh):
+            results[i] = result
+        return results, complete
+    
+    def _sentiment_error_results(self, texts: List[str], error: Exception) -> List[Dict[str, Any]]:
+        """Stand-in sentiment results for texts whose Gemini call failed with error"""
+        # Quota still exhausted after the retries, or the call outran its
+        # time budget: keyword scores beat empty placeholders
+        if _is_rate_limit_error(error) or isinstance(error, TimeoutError):
+            print("Gemini API quota/rate limit or time budget exceeded. Using fallback sentiment analysis.", file=sys.stderr)
+            return self._fallback_sentiment_analysis(texts)
+        return [{"sentiment": 0.0, "confidence": 0.0, "reasoning": f"Error: {str(error)}"} for _ in texts]
+    
+    def _request_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Score texts with Gemini, one concurrent call per chunk; raises on API or parse errors"""
+        if len(texts) <= SENTIMENT_CHUNK_SIZE:
+            return list(self.analyze_sentiment_stream(texts))
+        return _run_async(self._request_sentiment_chunks_async(texts), GEMINI_CALL_BUDGET_SECONDS)
+    
+    async def _request_sentiment_chunks_async(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Score SENTIMENT_CHUNK_SIZE-text chunks concurrently, bounded by MAX_CONCURRENCY"""
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        
+        async def _one(chunk: List[str]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                result = await self._call_gemini_async(self._sentiment_prompt(chunk), json_config(_RESPONSE_SCHEMAS["sentiment"]))
+            if isinstance(result, dict):
+                result = [result]
+            return self._pad_sentiments([r for r in result if isinstance(r, dict)], len(chunk))
+        
+        chunks = [texts[i:i + SENTIMENT_CHUNK_SIZE] for i in range(0, len(texts), SENTIMENT_CHUNK_SIZE)]
+        results = await asyncio.gather(*(_one(chunk) for chunk in chunks))
+        return [result for chunk_results in results for result in chunk_results]
+    
+    def _sentiment_prompt(self, texts: List[str]) -> str:
+        """Batch sentiment prompt for one chunk of texts"""
+        # Combine texts for batch analysis
+        combined_texts = "\n".join([f"{i+1}. {text}" for i, text in enumerate(texts)])
+        return _PROMPT_SENTIMENT.format(combined_texts=combined_texts)
+    
+    def _pad_sentiments(self, results: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+        """Trim or pad results to match the number of texts sent"""
+        results = results[:count]
+        results += [{"sentiment": 0.0, "confidence": 0.0, "reasoning": "No analysis available"}
+                    for _ in range(count - len(results))]
+        return results
+    
+    def analyze_sentiment_stream(self, texts: List[str], timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Yield per-text sentiment results in order as Gemini streams them
+        
+        Raises on API or parse errors, or when the stream runs past timeout
+        seconds (default GEMINI_CALL_BUDGET_SECONDS).
+        """
+        if not self.available:
+            for _ in texts:
+                yield {"sentiment": 0.0, "confidence": 0.0, "reasoning": "Gemini not available"}
+            return
+        
+        deadline = time.monotonic() + _budget(timeout)
+        # Long inputs are sent chunk by chunk to stay well inside the context window
+        for start in range(0, len(texts), SENTIMENT_CHUNK_SIZE):
+            chunk = texts[start:start + SENTIMENT_CHUNK_SIZE]
+            count = 0
+            for result in self._stream_gemini_objects(self._sentiment_prompt(chunk), json_config(_RESPONSE_SCHEMAS["sentiment"]),
+                                                      deadline, limit=len(chunk)):
+                yield result
+                count += 1
             
-            return [{"sentiment": 0.0, "confidence": 0.0, "reasoning": f"Error: {error_msg}"} for _ in texts]
+            # Pad to match input length
+            for _ in range(count, len(chunk)):
+                yield {"sentiment": 0.0, "confidence": 0.0, "reasoning": "No analysis available"}
+    
+    def _stream_gemini_objects(self, prompt: str, config: Optional[Any], deadline: float,
+                               limit: Optional[int] = None) -> Iterator[Any]:
+        """Yield JSON objects from a streamed Gemini reply as soon as each one is complete
+        
+        Stops after limit objects, cancelling the rest of the reply, and raises
+        TimeoutError when the next object hasn't arrived by deadline (monotonic).
+        """
+        key = self._cache_key(prompt, config)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield from cached[:limit]
+            return
+        
+        # The stream is consumed on the shared event loop and handed over
+        # object by object, so the caller can start on early results
+        objects: "queue.Queue[Any]" = queue.Queue()
+        done = object()
+        
+        async def _produce():
+            emitted = False
+            for attempt in range(RETRY_ATTEMPTS):
+                parser = _JsonObjectStream()
+                await _rate_limiter.acquire()
+                try:
+                    stream = await self.client.aio.models.generate_content_stream(model=MODEL_NAME, contents=prompt, config=config)
+                    async for chunk in stream:
+                        for obj in parser.feed(chunk.text or ""):
+                            objects.put(obj)
+                            emitted = True
+                    objects.put(done)
+                    return
+                except Exception as e:
+                    # Results already handed to the caller can't be taken back, so
+                    # only a rate limit hit before the first object is retried
+                    if emitted or attempt == RETRY_ATTEMPTS - 1 or not _is_rate_limit_error(e):
+                        objects.put(e)
+                        return
+                    await asyncio.sleep(_backoff_delay(e, attempt))
+        
+        producer = asyncio.run_coroutine_threadsafe(_produce(), _get_loop())
+        collected = []
+        try:
+            while limit is None or len(collected) < limit:
+                try:
+                    item = objects.get(timeout=max(deadline - time.monotonic(), 0.0))
+                except queue.Empty:
+                    raise TimeoutError("Gemini stream exceeded its time budget") from None
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                collected.append(item)
+                yield item
+        finally:
+            # Stops the request (and its retries) once nothing will read it:
+            # limit reached, error, timeout or the caller closing the generator
+            producer.cancel()
+        self._cache_put(key, collected)
+    
+    def _fallback_keywords(self, text: str) -> List[str]:
+        """Sentiment keywords occurring anywhere in text (substring matches, as before)"""
+        text_lower = text.lower()
+        return self._POS_RE.findall(text_lower) + self._NEG_RE.findall(text_lower)
+    
+    def _get_fallback_vec(self):
+        """Binary keyword presence vectorizer: columns are the positive words followed by the negative words"""
+        if self._fallback_vec is None:
+            from sklearn.feature_extraction.text import CountVectorizer
+            self._fallback_vec = CountVectorizer(
+                vocabulary=self._POSITIVE_WORDS + self._NEGATIVE_WORDS,
+                binary=True,
+                analyzer=self._fallback_keywords,
+            )
+        return self._fallback_vec
     
     def _fallback_sentiment_analysis(self, texts: List[str]) -> List[Dict[str, Any]]:
         """Simple fallback sentiment analysis when Gemini is unavailable"""
-        results = []
-        for text in texts:
-            text_lower = text.lower()
-            positive_words = ['great', 'amazing', 'excellent', 'love', 'best', 'good', 'wonderful', 'fantastic', 'awesome', 'perfect']
-            negative_words = ['terrible', 'awful', 'bad', 'hate', 'worst', 'poor', 'disappointed', 'horrible', 'useless', 'waste']
-            
-            positive_count = sum(1 for word in positive_words if word in text_lower)
-            negative_count = sum(1 for word in negative_words if word in text_lower)
-            
-            if positive_count > negative_count:
-                sentiment = 0.7
-                reasoning = "Positive keywords detected"
-            elif negative_count > positive_count:
-                sentiment = -0.7
-                reasoning = "Negative keywords detected"
-            else:
-                sentiment = 0.0
-                reasoning = "Neutral or mixed sentiment"
-            
-            results.append({
-                "sentiment": sentiment,
-                "confidence": 0.6,  # Lower confidence for fallback
-                "reasoning": f"Fallback analysis: {reasoning}"
-            })
+        if len(texts) < self._FALLBACK_VECTORIZE_MIN_ITEMS:
+            # Count distinct keywords present, as the substring checks did
+            counts = [(len(set(self._POS_RE.findall(text_lower))), len(set(self._NEG_RE.findall(text_lower))))
+                      for text_lower in [text.lower() for text in texts]]
+            positive_counts = np.array([pos for pos, _ in counts], dtype=np.int64)
+            negative_counts = np.array([neg for _, neg in counts], dtype=np.int64)
+        else:
+            present = self._get_fallback_vec().transform(texts)
+            n_positive = len(self._POSITIVE_WORDS)
+            positive_counts = np.asarray(present[:, :n_positive].sum(axis=1)).ravel()
+            negative_counts = np.asarray(present[:, n_positive:].sum(axis=1)).ravel()
         
-        return results
+        # 1 = positive, -1 = negative, 0 = neutral or mixed
+        polarity = np.sign(positive_counts - negative_counts)
+        outcomes = {
+            1: (0.7, "Positive keywords detected"),
+            -1: (-0.7, "Negative keywords detected"),
+            0: (0.0, "Neutral or mixed sentiment"),
+        }
+        return [
+            {
+                "sentiment": outcomes[p][0],
+                "confidence": 0.6,  # Lower confidence for fallback
+                "reasoning": f"Fallback analysis: {outcomes[p][1]}",
+                "method": "keyword_fallback"
+            }
+            for p in polarity.tolist()
+        ]
     
     def analyze_sentiment(self, text: str) -> Dict[str, Any]:
         """Single sentiment analysis using Gemini (fallback for compatibility)"""
         results = self.analyze_sentiment_batch([text])
         return results[0] if results else {"sentiment": 0.0, "confidence": 0.0, "reasoning": "No analysis available"}
     
-    def extract_themes(self, texts: List[str]) -> Dict[str, Any]:
-        """Extract themes and topics from feedback using Gemini"""
+    def analyze_sentiment_and_themes(self, texts: List[str],
+                                     timeout: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Sentiment per text plus the themes of all texts from a single Gemini call
+        
+        The texts are uploaded once instead of once per task. The two results
+        have the shapes analyze_sentiment_batch and extract_themes return.
+        """
+        if not self.available:
+            return ([{"sentiment": 0.0, "confidence": 0.0, "reasoning": "Gemini not available"} for _ in texts],
+                    {"themes": [], "reasoning": "Gemini not available"})
+        
+        unique, index = _dedupe(texts)
+        combined_texts = "\n".join([f"{i+1}. {text}" for i, text in enumerate(unique)])
+        prompt = _PROMPT_SENTIMENT_AND_THEMES.format(combined_texts=combined_texts)
+        
+        try:
+            result = self._call_gemini(prompt, json_config(_RESPONSE_SCHEMAS["sentiment_and_themes"]), timeout=timeout)
+        except Exception as e:
+            print(f"Gemini sentiment/themes analysis error: {e}", file=sys.stderr)
+            sentiments = self._sentiment_error_results(unique, e)
+            themes = {"themes": [], "summary": "", "reasoning": f"Error: {str(e)}"}
+        else:
+            sentiments = self._pad_sentiments([r for r in result.get("sentiments", []) if isinstance(r, dict)], len(unique))
+            themes = {
+                "themes": result.get("themes", []),
+                "summary": result.get("summary", ""),
+                "reasoning": "Gemini analysis completed"
+            }
+        return [sentiments[i] for i in index], themes
+    
+    def extract_themes(self, texts: List[str], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Extract themes and topics from feedback using Gemini within timeout seconds"""
         if not self.available:
             return {"themes": [], "reasoning": "Gemini not available"}
         
         try:
-            # Combine texts for analysis
-            combined_text = "\n".join([f"{i+1}. {text}" for i, text in enumerate(texts)])
-            
-            prompt = f"""
-            Analyze these customer feedback texts and identify the main themes/topics. 
-            Provide:
-            1. List of main themes (3-7 themes)
-            2. For each theme, provide keywords and brief description
-            3. Overall summary of customer sentiment patterns
+            # Combine texts for analysis; repeated feedback only needs sending once
+            unique, _ = _dedupe(texts)
+            combined_text = "\n".join([f"{i+1}. {text}" for i, text in enumerate(unique)])
             
-            Feedback texts:
-            {combined_text}
+            prompt = _PROMPT_THEMES.format(combined_texts=combined_text)
             
-            Respond ONLY in JSON format:
-            {{
-                "themes": [
-                    {{
-                        "name": "<theme_name>",
-                        "keywords": ["keyword1", "keyword2"],
-                        "description": "<brief description>",
-                        "sentiment": "<positive/negative/neutral>"
-                    }}
-                ],
-                "summary": "<overall summary>"
-            }}
-            """
-            
-            response = self.model.generate_content(prompt)
-            result = self._parse_gemini_response(response.text.strip() if response.text else "")
+            result = self._call_gemini(prompt, json_config(_RESPONSE_SCHEMAS["themes"]), timeout=timeout)
             
             return {
                 "themes": result.get("themes", []),
@@ -209,8 +930,8 @@ class GeminiAnalyzer:
             print(f"Gemini theme extraction error: {e}", file=sys.stderr)
             return {"themes": [], "summary": "", "reasoning": f"Error: {str(e)}"}
     
-    def generate_insights(self, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate actionable insights from analysis data"""
+    def generate_insights(self, analysis_data: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Generate actionable insights from analysis data within timeout seconds"""
         if not self.available:
             return {"insights": [], "recommendations": []}
         
@@ -222,34 +943,9 @@ class GeminiAnalyzer:
                 "sentiment_distribution": "mixed"  # Could be calculated from actual data
             }
             
-            prompt = f"""
-            Based on this customer feedback analysis data, provide:
-            1. Key insights about customer satisfaction
-            2. Actionable recommendations for improvement
-            3. Priority areas to focus on
-            
-            Analysis Data:
-            {json.dumps(data_summary, indent=2)}
-            
-            Respond ONLY in JSON format:
-            {{
-                "insights": [
-                    "<insight 1>",
-                    "<insight 2>"
-                ],
-                "recommendations": [
-                    {{
-                        "action": "<specific action>",
-                        "priority": "<high/medium/low>",
-                        "impact": "<expected impact>"
-                    }}
-                ],
-                "priority_areas": ["<area 1>", "<area 2>"]
-            }}
-            """
+            prompt = _PROMPT_INSIGHTS.format(analysis_data=_dumps_json_compact(data_summary))
             
-            response = self.model.generate_content(prompt)
-            result = self._parse_gemini_response(response.text.strip() if response.text else "")
+            result = self._call_gemini(prompt, json_config(_RESPONSE_SCHEMAS["insights"]), timeout=timeout)
             
             return {
                 "insights": result.get("insights", []),
@@ -262,78 +958,55 @@ class GeminiAnalyzer:
             print(f"Gemini insights generation error: {e}", file=sys.stderr)
             return {"insights": [], "recommendations": [], "priority_areas": [], "reasoning": f"Error: {str(e)}"}
     
-    def enhance_cluster_labels(self, cluster_texts: Dict[int, List[str]]) -> Dict[int, Dict[str, Any]]:
-        """Generate better cluster labels using Gemini"""
+    def enhance_cluster_labels(self, cluster_texts: Dict[int, List[str]],
+                               timeout: Optional[float] = None) -> Dict[int, Dict[str, Any]]:
+        """Generate better cluster labels using Gemini (one concurrent request per cluster)
+        
+        Clusters not labelled within timeout seconds get the error placeholder.
+        """
         if not self.available:
             return {}
         
-        enhanced_labels = {}
+        return _run_async(self._enhance_cluster_labels_async(cluster_texts, time.monotonic() + _budget(timeout)))
+    
+    async def _enhance_cluster_labels_async(self, cluster_texts: Dict[int, List[str]],
+                                            deadline: float) -> Dict[int, Dict[str, Any]]:
+        """Label all clusters concurrently, bounded by MAX_CONCURRENCY and the deadline"""
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
         
-        for cluster_id, texts in cluster_texts.items():
-            try:
-                sample_texts = texts[:5]  # Use first 5 texts as sample
-                combined_sample = "\n".join([f"{i+1}. {text}" for i, text in enumerate(sample_texts)])
-                
-                prompt = f"""
-                Analyze these customer feedback texts from a cluster and provide:
-                1. A descriptive label for this cluster
-                2. Key keywords that represent this cluster
-                3. The main sentiment/tone of this cluster
-                
-                Sample feedback texts:
-                {combined_sample}
-                
-                Respond ONLY in JSON format:
-                {{
-                    "label": "<descriptive cluster name>",
-                    "keywords": ["keyword1", "keyword2", "keyword3"],
-                    "sentiment": "<positive/negative/neutral>",
-                    "description": "<brief description of what this cluster represents>"
-                }}
-                """
-                
-                response = self.model.generate_content(prompt)
-                
-                # Handle potential non-JSON responses
-                response_text = response.text.strip() if response.text else ""
-                
-                # Try to extract JSON from the response if it's wrapped in markdown or other text
-                if response_text.startswith("```json"):
-                    # Extract JSON from markdown code block
-                    start = response_text.find("```json") + 7
-                    end = response_text.find("```", start)
-                    if end != -1:
-                        response_text = response_text[start:end].strip()
-                elif response_text.startswith("```"):
-                    # Extract JSON from generic code block
-                    start = response_text.find("```") + 3
-                    end = response_text.find("```", start)
-                    if end != -1:
-                        response_text = response_text[start:end].strip()
-                
-                # Try to find JSON object in the response
-                if not response_text.startswith("{"):
-                    # Look for JSON object in the response
-                    start = response_text.find("{")
-                    end = response_text.rfind("}") + 1
-                    if start != -1 and end > start:
-                        response_text = response_text[start:end]
-                
-                if not response_text:
-                    raise ValueError("Empty response from Gemini API")
-                
-                result = json.loads(response_text)
-                
-                enhanced_labels[cluster_id] = {
-                    "label": result.get("label", f"Cluster {cluster_id}"),
-                    "keywords": result.get("keywords", []),
-                    "sentiment": result.get("sentiment", "neutral"),
-                    "description": result.get("description", ""),
-                    "enhanced_by": "gemini"
-                }
-                
-            except Exception as e:
-                print(f"Gemini cluster enhancement error for cluster {cluster_id}: {e}", file=sys.stderr)
+        async def _one(cluster_id: int, texts: List[str]):
+            sample_texts = texts[:5]  # Use first 5 texts as sample
+            combined_sample = "\n".join([f"{i+1}. {text}" for i, text in enumerate(sample_texts)])
+            
+            prompt = _PROMPT_CLUSTER_LABEL.format(combined_sample=combined_sample)
+            
+            async with semaphore:
+                try:
+                    result = await asyncio.wait_for(
+                        self._call_gemini_async(prompt, json_config(_RESPONSE_SCHEMAS["cluster_label"])),
+                        max(deadline - time.monotonic(), 0.0),
+                    )
+                except TimeoutError:
+                    raise TimeoutError("Gemini call exceeded its time budget") from None
+            
+            return cluster_id, {
+                "label": result.get("label", f"Cluster {cluster_id}"),
+                "keywords": result.get("keywords", []),
+                "sentiment": result.get("sentiment", "neutral"),
+                "description": result.get("description", ""),
+                "enhanced_by": "gemini"
+            }
+        
+        cluster_ids = list(cluster_texts)
+        results = await asyncio.gather(
+            *[_one(cluster_id, cluster_texts[cluster_id]) for cluster_id in cluster_ids],
+            return_exceptions=True
+        )
+        
+        enhanced_labels = {}
+        for cluster_id, result in zip(cluster_ids, results):
+            if isinstance(result, Exception):
+                print(f"Gemini cluster enhancement error for cluster {cluster_id}: {result}", file=sys.stderr)
                 enhanced_labels[cluster_id] = {
                     "label": f"Cluster {cluster_id}",
                     "keywords": [],
@@ -341,15 +1014,20 @@ class GeminiAnalyzer:
                     "description": "",
                     "enhanced_by": "error"
                 }
+            else:
+                enhanced_labels[cluster_id] = result[1]
         
         return enhanced_labels
 
 # Global instance
 _gemini_analyzer = None
+_singleton_lock = threading.Lock()
 
 def get_gemini_analyzer() -> GeminiAnalyzer:
     """Get or create global Gemini analyzer instance"""
     global _gemini_analyzer
     if _gemini_analyzer is None:
-        _gemini_analyzer = GeminiAnalyzer()
+        with _singleton_lock:
+            if _gemini_analyzer is None:
+                _gemini_analyzer = GeminiAnalyzer()
     return _gemini_analyzer
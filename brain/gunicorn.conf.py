@@ -0,0 +1,24 @@
+"""
+Gunicorn configuration for the Brain Service
+Threaded workers overlap Gemini I/O across concurrent /analyze requests
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("BRAIN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("BRAIN_WORKERS", multiprocessing.cpu_count()))
+# Exported so each worker can take its share of per-key and per-host limits
+os.environ["BRAIN_WORKERS"] = str(workers)
+worker_class = "gthread"
+threads = int(os.getenv("BRAIN_THREADS", 4))
+timeout = 120
+
+
+def post_fork(server, worker):
+    """Build the analyzer once per worker so all its threads share one Gemini client"""
+    try:
+        from analyze import get_analyzer
+        get_analyzer()
+    except (Exception, SystemExit) as e:
+        server.log.warning("Analyzer warm-up failed in worker %s: %s", worker.pid, e)
@@ -1,50 +1,208 @@
 #!/usr/bin/env python3
 """
 Hybrid AI Feedback Analyzer - Efficient approach using traditional ML + minimal LLM
-Reduces API calls from 11+ to just 2 by using VADER sentiment and TF-IDF keywords
+Reduces API calls from 11+ to just 1 by using VADER sentiment and TF-IDF keywords
 """
 
+import os
 import sys
 import json
 import re
 import math
-from typing import List, Dict, Any, Optional
+import time
+import hashlib
+import textwrap
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple, Union
 import numpy as np
-import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from joblib import Parallel, delayed, cpu_count
+from scipy.sparse import csr_matrix
 
-# Traditional ML libraries
-try:
-    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-    VADER_AVAILABLE = True
-except ImportError:
-    VADER_AVAILABLE = False
-    print("Warning: vaderSentiment not available", file=sys.stderr)
-
-try:
-    from rake_nltk import Rake
-    RAKE_AVAILABLE = True
-except ImportError:
-    RAKE_AVAILABLE = False
-    print("Warning: rake-nltk not available", file=sys.stderr)
+from sqlite_cache import SQLiteTTLCache
 
 # Import Gemini analyzer (minimal usage)
 try:
-    from gemini_analyzer import get_gemini_analyzer
+    from gemini_analyzer import get_gemini_analyzer, json_config, GEMINI_CALL_BUDGET_SECONDS
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
     print("Warning: Gemini analyzer not available", file=sys.stderr)
 
+# Text cleaning patterns; one non-alphanumeric run pass also collapses whitespace
+_URL_RE = re.compile(r"https?://\S+")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+# Gemini reply cache: exact prompt hits are persisted in SQLite with a TTL
+PROMPT_CACHE_PATH = os.getenv(
+    "PROMPT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_cache.db"),
+)
+PROMPT_CACHE_TTL_SECONDS = 7 * 24 * 3600
+_prompt_cache = SQLiteTTLCache(PROMPT_CACHE_PATH, "prompt", PROMPT_CACHE_TTL_SECONDS, value_column="response")
+
+# Heavy dependencies (scikit-learn, the VADER lexicon) load on first use, so
+# importing this module for clean_text or compute_roi stays cheap
+@lru_cache(maxsize=1)
+def _get_vader():
+    """Shared VADER analyzer (lexicon loaded once per process), or None if unavailable"""
+    try:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    except ImportError:
+        print("Warning: vaderSentiment not available", file=sys.stderr)
+        return None
+    return SentimentIntensityAnalyzer()
+
+def _vader_scores_chunk(chunk: List[str]) -> List[Dict[str, float]]:
+    """VADER polarity scores for a chunk of texts (process pool worker)"""
+    vader = _get_vader()
+    return [vader.polarity_scores(text) for text in chunk]
+
+def _new_tfidf_vectorizer(**overrides):
+    """Unfitted TF-IDF vectorizer shared by clustering and cluster keywords"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    params = dict(max_features=2000, stop_words='english', ngram_range=(1, 2),
+                  min_df=1, max_df=0.8, sublinear_tf=True)
+    params.update(overrides)
+    return TfidfVectorizer(**params)
+
+# The hybrid Gemini calls are not latency-critical, so default to the cheaper flex tier
+GEMINI_SERVICE_TIER = os.getenv("GEMINI_SERVICE_TIER", "flex")
+
+# A flex request gets one attempt within FLEX_ATTEMPT_TIMEOUT_SECONDS; if it
+# is rejected or queued past that, the call falls back to the standard tier
+# for the rest of GEMINI_CALL_BUDGET_SECONDS
+FLEX_ATTEMPT_TIMEOUT_SECONDS = 30.0
+
+# Below this many feedback items the traditional ML labels are good enough,
+# so the Gemini round-trip is skipped and the analysis runs fully offline
+GEMINI_MIN_ITEMS = int(os.getenv("GEMINI_MIN_ITEMS", "15"))
+
+# Structured-output schema for the combined cluster enhancement + insights call
+_STRING_LIST_SCHEMA = {"type": "ARRAY", "items": {"type": "STRING"}}
+ENHANCE_AND_INSIGHTS_SCHEMA: Dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "enhanced_clusters": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "cluster_id": {"type": "INTEGER"},
+                    "enhanced_label": {"type": "STRING"},
+                    "enhanced_keywords": _STRING_LIST_SCHEMA,
+                    "description": {"type": "STRING"},
+                },
+                "required": ["cluster_id", "enhanced_label", "enhanced_keywords", "description"],
+            },
+        },
+        "insights": _STRING_LIST_SCHEMA,
+        "recommendations": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "action": {"type": "STRING"},
+                    "priority": {"type": "STRING", "enum": ["high", "medium", "low"]},
+                    "impact": {"type": "STRING"},
+                },
+                "required": ["action", "priority", "impact"],
+            },
+        },
+        "priority_areas": _STRING_LIST_SCHEMA,
+    },
+    "required": ["enhanced_clusters", "insights", "recommendations", "priority_areas"],
+}
+
+# Static instructions come first and the per-request cluster data last, so every
+# request shares a byte-identical prefix that Gemini's implicit prompt caching can reuse
+_PROMPT_ENHANCE_AND_INSIGHTS = textwrap.dedent("""\
+    Analyze the customer feedback clusters given in CLUSTER_DATA_JSON below.
+
+    Task 1 - enhanced_clusters: for each cluster, provide
+    1. A better, more descriptive label
+    2. Top 3-5 keywords that represent this cluster
+    3. Brief description of what this cluster represents
+
+    Task 2 - actionable business insights:
+    1. 3-5 key insights about customer satisfaction
+    2. 3-5 actionable recommendations
+    3. Priority areas to focus on
+
+    Respond ONLY in JSON format:
+    {
+        "enhanced_clusters": [
+            {
+                "cluster_id": <cluster_number>,
+                "enhanced_label": "<better descriptive label>",
+                "enhanced_keywords": ["keyword1", "keyword2", "keyword3"],
+                "description": "<brief description>"
+            }
+        ],
+        "insights": ["<insight 1>", "<insight 2>"],
+        "recommendations": [
+            {
+                "action": "<specific action>",
+                "priority": "<high/medium/low>",
+                "impact": "<expected impact>"
+            }
+        ],
+        "priority_areas": ["<area 1>", "<area 2>"]
+    }
+""")
+
+# VADER scoring stays in-process unless VADER_N_JOBS asks for a process pool
+# (at 10k texts a pool measured slower than the serial loop on a busy host),
+# and even then only above PARALLEL_VADER_MIN_ITEMS distinct texts
+VADER_N_JOBS = int(os.getenv("VADER_N_JOBS", "1"))
+PARALLEL_VADER_MIN_ITEMS = 2000
+
+# Below this many items full KMeans is cheap enough; above it MiniBatchKMeans
+MINIBATCH_KMEANS_MIN_ITEMS = 200
+
+def _parallel_map_chunks(func, items: List[Any], n_jobs: int) -> List[Any]:
+    """Apply func (list in, list out) to contiguous chunks of items in a process pool
+    
+    n_jobs is capped at this process's share of the cores, since each of the
+    BRAIN_WORKERS gunicorn workers may fan out at once; one job runs func
+    in-process.
+    """
+    n_jobs = max(1, min(n_jobs, cpu_count() // max(1, int(os.getenv("BRAIN_WORKERS", "1")))))
+    if n_jobs == 1:
+        return func(items)
+    chunk_size = -(-len(items) // n_jobs)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    results = Parallel(n_jobs=n_jobs, prefer="processes")(delayed(func)(c) for c in chunks)
+    return [result for chunk in results for result in chunk]
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (argpartition, then sort only the k)"""
+    k = min(k, scores.size)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+def _bucket_rows(labels: np.ndarray) -> Dict[int, np.ndarray]:
+    """Row indices per cluster id (ascending), from one stable argsort of the labels"""
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind='stable')
+    cluster_ids, starts = np.unique(labels[order], return_index=True)
+    return dict(zip(cluster_ids.tolist(), np.split(order, starts[1:])))
+
 class HybridAnalyzer:
     """Efficient analyzer using traditional ML + minimal LLM usage"""
     
-    def __init__(self):
-        self.vader = SentimentIntensityAnalyzer() if VADER_AVAILABLE else None
-        self.rake = Rake() if RAKE_AVAILABLE else None
+    def __init__(self, service_tier: Optional[str] = GEMINI_SERVICE_TIER, gemini_min_items: int = GEMINI_MIN_ITEMS):
+        # Gemini service tier for the enhancement/insight calls ("flex" is
+        # discounted but slower; empty or None means the standard tier)
+        self.service_tier = service_tier or None
+        self.gemini_min_items = gemini_min_items
         self.gemini = None
+        # Most recent TF-IDF fit: (corpus hash, matrix, feature names)
+        self._tfidf_fit: Optional[Tuple[str, csr_matrix, np.ndarray]] = None
+        self._tfidf_lock = threading.Lock()
         
         if GEMINI_AVAILABLE:
             try:
@@ -58,20 +216,36 @@ class HybridAnalyzer:
         """Clean and normalize text"""
         if not isinstance(text, str):
             return ""
-        text = text.lower()
-        text = re.sub(r"https?://\S+", " ", text)
-        text = re.sub(r"[^a-z0-9\s]", " ", text)
-        text = re.sub(r"\s+", " ", text).strip()
-        return text
+        text = _URL_RE.sub(" ", text.lower())
+        return _NON_ALNUM_RE.sub(" ", text).strip()
+    
+    def clean_texts(self, texts: List[Any]) -> List[str]:
+        """Clean a batch of texts, cleaning each distinct string only once"""
+        cleaned = {text: self.clean_text(text) for text in dict.fromkeys(t for t in texts if isinstance(t, str))}
+        return [cleaned[text] if isinstance(text, str) else "" for text in texts]
+    
+    @property
+    def vader(self):
+        """Process-wide VADER analyzer (None when vaderSentiment is missing)"""
+        return _get_vader()
     
     def get_sentiment_vader(self, texts: List[str]) -> List[Dict[str, Any]]:
         """Get sentiment scores using VADER (fast, free, no API calls)"""
-        if not self.vader:
+        vader = self.vader
+        if not vader:
             return [{"sentiment": 0.0, "confidence": 0.5, "reasoning": "VADER not available"} for _ in texts]
         
+        # Score each distinct text once; repeated feedback reuses the result
+        distinct = list(dict.fromkeys(texts))
+        if len(distinct) <= PARALLEL_VADER_MIN_ITEMS:
+            scores = _vader_scores_chunk(distinct)
+        else:
+            scores = _parallel_map_chunks(_vader_scores_chunk, distinct, VADER_N_JOBS)
+        scores_by_text = dict(zip(distinct, scores))
+        
         results = []
         for text in texts:
-            scores = self.vader.polarity_scores(text)
+            scores = scores_by_text[text]
             compound_score = scores['compound']
             
             # Convert to -1 to 1 scale
@@ -90,63 +264,79 @@ class HybridAnalyzer:
         return results
     
     def extract_keywords_tfidf(self, texts: List[str], max_features: int = 20) -> List[str]:
-        """Extract keywords using TF-IDF (no API calls)"""
+        """Extract keywords using TF-IDF (no API calls)
+        
+        Ranks terms of the shared (cached) fit by mean score over all rows, so
+        texts already vectorized by analyze_feedback are not fit again.
+        """
         if len(texts) == 0:
             return []
         
         try:
-            vectorizer = TfidfVectorizer(
-                max_features=max_features,
-                stop_words='english',
-                ngram_range=(1, 2),
-                min_df=1,
-                max_df=0.8
-            )
-            
-            tfidf_matrix = vectorizer.fit_transform(texts)
-            feature_names = vectorizer.get_feature_names_out()
-            
-            # Get top keywords by mean TF-IDF score
-            mean_scores = np.mean(tfidf_matrix.toarray(), axis=0)
-            top_indices = np.argsort(mean_scores)[-max_features:][::-1]
-            
-            keywords = [feature_names[i] for i in top_indices if mean_scores[i] > 0]
-            return keywords[:10]  # Return top 10
+            tfidf_matrix, feature_names = self.fit_tfidf(texts)
+            return self.cluster_keywords(tfidf_matrix, feature_names, k=min(max_features, 10))  # Return top 10
             
         except Exception as e:
             print(f"TF-IDF keyword extraction error: {e}", file=sys.stderr)
             return []
     
-    def extract_keywords_rake(self, texts: List[str]) -> List[str]:
-        """Extract keywords using RAKE (fallback)"""
-        if not self.rake or len(texts) == 0:
-            return []
+    def fit_tfidf(self, texts: List[str]) -> Tuple[csr_matrix, np.ndarray]:
+        """Fit TF-IDF on texts; returns the sparse matrix and its feature names
         
+        The last fit is kept, so re-analyzing the same corpus skips vectorization.
+        """
+        key = hashlib.sha256(b"\x00".join(text.encode("utf-8") for text in texts)).hexdigest()
+        with self._tfidf_lock:
+            if self._tfidf_fit is not None and self._tfidf_fit[0] == key:
+                return self._tfidf_fit[1:]
+        
+        # A fresh vectorizer per fit, so concurrent analyses never share one mid-fit
+        vectorizer = _new_tfidf_vectorizer()
         try:
-            combined_text = " ".join(texts)
-            self.rake.extract_keywords_from_text(combined_text)
-            keywords = self.rake.get_ranked_phrases()[:10]
-            return keywords
-        except Exception as e:
-            print(f"RAKE keyword extraction error: {e}", file=sys.stderr)
-            return []
+            tfidf_matrix = vectorizer.fit_transform(texts)
+        except ValueError:
+            # max_df pruning can remove every term from tiny or repetitive corpora
+            vectorizer = _new_tfidf_vectorizer(max_df=1.0)
+            tfidf_matrix = vectorizer.fit_transform(texts)
+        # Feature names are materialized once per fit and reused by every keyword lookup
+        feature_names = vectorizer.get_feature_names_out()
+        
+        with self._tfidf_lock:
+            self._tfidf_fit = (key, tfidf_matrix, feature_names)
+        return tfidf_matrix, feature_names
     
-    def get_embeddings(self, texts: List[str]) -> np.ndarray:
-        """Get embeddings using TF-IDF"""
-        vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-        tfidf_matrix = vectorizer.fit_transform(texts)
-        return tfidf_matrix.toarray()
+    def cluster_keywords(self, tfidf_matrix: csr_matrix, feature_names: np.ndarray,
+                         rows: Optional[np.ndarray] = None, k: int = 5) -> List[str]:
+        """Top-k terms of a cluster by mean TF-IDF over its rows of the shared matrix (all rows if None)"""
+        subset = tfidf_matrix if rows is None else tfidf_matrix[rows]
+        mean_scores = np.asarray(subset.mean(axis=0)).ravel()
+        top = _top_k_indices(mean_scores, k)
+        return feature_names[top[mean_scores[top] > 0]].tolist()
     
-    def generate_cluster_labels_traditional(self, texts: List[str], labels: np.ndarray) -> Dict[int, Dict[str, Any]]:
-        """Generate cluster labels using traditional ML (no API calls)"""
-        df = pd.DataFrame({"text": texts, "label": labels})
-        label_to_texts = {int(l): df[df.label == l]["text"].tolist() for l in sorted(df.label.unique())}
+    def generate_cluster_labels_traditional(self, texts: List[str], labels: np.ndarray,
+                                            tfidf_matrix: Optional[csr_matrix] = None,
+                                            feature_names: Optional[np.ndarray] = None,
+                                            sentiments: Optional[np.ndarray] = None,
+                                            cluster_rows: Optional[Dict[int, np.ndarray]] = None) -> Dict[int, Dict[str, Any]]:
+        """Generate cluster labels using traditional ML (no API calls)
+        
+        sentiments holds per-text compound scores aligned with texts and
+        cluster_rows the row indices per cluster; omitted ones are computed here.
+        """
+        if tfidf_matrix is None or feature_names is None:
+            tfidf_matrix, feature_names = self.fit_tfidf(texts)
+        if sentiments is None:
+            sentiments = [result["sentiment"] for result in self.get_sentiment_vader(texts)]
+        if cluster_rows is None:
+            cluster_rows = _bucket_rows(labels)
+        sentiments = np.asarray(sentiments, dtype=float)
         
         enhanced_labels = {}
         
-        for cluster_id, cluster_texts in label_to_texts.items():
-            # Extract keywords for this cluster
-            keywords = self.extract_keywords_tfidf(cluster_texts, max_features=5)
+        for cluster_id, rows in cluster_rows.items():
+            
+            # Extract keywords for this cluster from its rows of the shared TF-IDF matrix
+            keywords = self.cluster_keywords(tfidf_matrix, feature_names, rows, k=5)
             
             # Generate simple label based on keywords
             if keywords:
@@ -156,14 +346,8 @@ class HybridAnalyzer:
             else:
                 label = f"Cluster {cluster_id}"
             
-            # Calculate cluster sentiment
-            cluster_sentiments = []
-            for text in cluster_texts:
-                if self.vader:
-                    scores = self.vader.polarity_scores(text)
-                    cluster_sentiments.append(scores['compound'])
-            
-            avg_sentiment = np.mean(cluster_sentiments) if cluster_sentiments else 0.0
+            # Calculate cluster sentiment from the precomputed scores
+            avg_sentiment = float(sentiments[rows].mean()) if rows.size else 0.0
             
             if avg_sentiment > 0.1:
                 sentiment_label = "positive"
@@ -182,13 +366,40 @@ class HybridAnalyzer:
         
         return enhanced_labels
     
-    def enhance_with_gemini_batch(self, cluster_summaries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Enhance cluster labels using Gemini (single batch call)"""
-        if not self.gemini or not self.gemini.available:
-            return cluster_summaries
+    def _call_gemini_within_budget(self, prompt: str, schema: Dict[str, Any]) -> Any:
+        """Call Gemini on the configured tier without exceeding GEMINI_CALL_BUDGET_SECONDS"""
+        deadline = time.monotonic() + GEMINI_CALL_BUDGET_SECONDS
+        tier = self.service_tier
+        if tier == "flex":
+            try:
+                return self.gemini._call_gemini(prompt, json_config(schema, tier), attempts=1,
+                                                timeout=FLEX_ATTEMPT_TIMEOUT_SECONDS)
+            except Exception as e:
+                print(f"Gemini flex request failed ({e!r}); retrying on the standard tier", file=sys.stderr)
+                tier = None
+        return self.gemini._call_gemini(prompt, json_config(schema, tier), timeout=deadline - time.monotonic())
+    
+    def enhance_and_insights_gemini(self, cluster_summaries: List[Dict[str, Any]],
+                                    total_items: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any], int]:
+        """Enhance cluster labels and generate insights using Gemini (single call)
         
+        Returns the summaries, the insights and the number of Gemini API calls
+        made (0 when skipped or answered from the prompt cache). Corpora smaller
+        than gemini_min_items skip the call and keep the traditional labels.
+        """
+        too_small = total_items < self.gemini_min_items
+        if too_small:
+            print(f"Skipping Gemini for {total_items} items (below {self.gemini_min_items})", file=sys.stderr)
+        if too_small or not self.gemini or not self.gemini.available:
+            return cluster_summaries, {
+                "insights": ["Analysis completed using traditional ML methods"],
+                "recommendations": [],
+                "priority_areas": []
+            }, 0
+        
+        api_calls = 0
         try:
-            # Prepare data for batch processing
+            # One cluster-data block serves both the enhancement and the insights task
             clusters_data = []
             for cluster in cluster_summaries:
                 clusters_data.append({
@@ -199,115 +410,47 @@ class HybridAnalyzer:
                     "avg_sentiment": cluster["avg_sentiment"]
                 })
             
-            prompt = f"""
-            Enhance these customer feedback cluster labels to be more descriptive and actionable.
-            For each cluster, provide:
-            1. A better, more descriptive label
-            2. Top 3-5 keywords that represent this cluster
-            3. Brief description of what this cluster represents
-            
-            Cluster Data:
-            {json.dumps(clusters_data, indent=2)}
-            
-            Respond ONLY in JSON format with an array of enhanced clusters:
-            [
-                {{
-                    "cluster_id": <cluster_number>,
-                    "enhanced_label": "<better descriptive label>",
-                    "enhanced_keywords": ["keyword1", "keyword2", "keyword3"],
-                    "description": "<brief description>"
-                }}
-            ]
-            """
-            
-            response = self.gemini.model.generate_content(prompt)
-            result = self.gemini._parse_gemini_response(response.text.strip() if response.text else "")
-            
-            if isinstance(result, list):
-                # Map enhanced results back to original clusters
-                enhanced_map = {item["cluster_id"]: item for item in result}
-                
-                for cluster in cluster_summaries:
-                    cluster_id = cluster["cluster"]
-                    if cluster_id in enhanced_map:
-                        enhanced = enhanced_map[cluster_id]
-                        cluster["label"] = enhanced.get("enhanced_label", cluster["label"])
-                        cluster["keywords"] = enhanced.get("enhanced_keywords", cluster["keywords"])
-                        cluster["description"] = enhanced.get("description", cluster["description"])
-                        cluster["enhanced_by"] = "gemini_batch"
-            
-            return cluster_summaries
-            
-        except Exception as e:
-            print(f"Gemini batch enhancement error: {e}", file=sys.stderr)
-            return cluster_summaries
-    
-    def generate_insights_gemini(self, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate final insights using Gemini (single call)"""
-        if not self.gemini or not self.gemini.available:
-            return {
-                "insights": ["Analysis completed using traditional ML methods"],
-                "recommendations": [],
-                "priority_areas": []
-            }
-        
-        try:
-            # Prepare summary for Gemini
-            clusters_summary = []
-            for cluster in analysis_data.get("clusters", []):
-                clusters_summary.append({
-                    "label": cluster["label"],
-                    "volume": cluster["volume"],
-                    "sentiment": cluster["avg_sentiment"],
-                    "keywords": cluster["keywords"][:3]
-                })
-            
-            prompt = f"""
-            Based on this customer feedback analysis, provide actionable business insights:
-            
-            Analysis Summary:
-            - Total feedback items: {len(analysis_data.get('items', []))}
-            - Clusters found: {len(analysis_data.get('clusters', []))}
-            
-            Cluster Details:
-            {json.dumps(clusters_summary, indent=2)}
-            
-            Provide:
-            1. 3-5 key insights about customer satisfaction
-            2. 3-5 actionable recommendations
-            3. Priority areas to focus on
+            # Compact separators save billed tokens; sort_keys keeps equal cluster data
+            # byte-identical so the prompt (and its cache key) is stable
+            payload = json.dumps(clusters_data, separators=(",", ":"), sort_keys=True)
+            prompt = _PROMPT_ENHANCE_AND_INSIGHTS + (
+                f"\nTOTAL_ITEMS: {total_items}\nCLUSTER_COUNT: {len(clusters_data)}\n"
+                f"CLUSTER_DATA_JSON:\n{payload}\n"
+            )
             
-            Respond ONLY in JSON format:
-            {{
-                "insights": ["<insight 1>", "<insight 2>"],
-                "recommendations": [
-                    {{
-                        "action": "<specific action>",
-                        "priority": "<high/medium/low>",
-                        "impact": "<expected impact>"
-                    }}
-                ],
-                "priority_areas": ["<area 1>", "<area 2>"]
-            }}
-            """
+            # Exact-prompt cache (SQLite); only a miss costs an API call
+            key = hashlib.sha256(f"enhance_and_insights|{prompt}".encode("utf-8")).hexdigest()
+            result = _prompt_cache.get(key)
+            if result is None:
+                api_calls = 1
+                result = self._call_gemini_within_budget(prompt, ENHANCE_AND_INSIGHTS_SCHEMA)
+                _prompt_cache.put(key, result)
             
-            response = self.gemini.model.generate_content(prompt)
-            result = self.gemini._parse_gemini_response(response.text.strip() if response.text else "")
+            # Map enhanced results back to original clusters
+            enhanced_map = {item["cluster_id"]: item for item in result.get("enhanced_clusters", [])}
+            for cluster in cluster_summaries:
+                cluster_id = cluster["cluster"]
+                if cluster_id in enhanced_map:
+                    enhanced = enhanced_map[cluster_id]
+                    cluster["label"] = enhanced.get("enhanced_label", cluster["label"])
+                    cluster["keywords"] = enhanced.get("enhanced_keywords", cluster["keywords"])
+                    cluster["description"] = enhanced.get("description", cluster["description"])
+                    cluster["enhanced_by"] = "gemini_batch"
             
-            return {
+            return cluster_summaries, {
                 "insights": result.get("insights", []),
                 "recommendations": result.get("recommendations", []),
                 "priority_areas": result.get("priority_areas", []),
                 "method": "gemini_insights"
-            }
+            }, api_calls
             
         except Exception as e:
-            print(f"Gemini insights generation error: {e}", file=sys.stderr)
-            return {
+            print(f"Gemini enhancement/insights error: {e}", file=sys.stderr)
+            return cluster_summaries, {
                 "insights": ["Analysis completed - detailed insights unavailable"],
                 "recommendations": [],
                 "priority_areas": []
-            }
+            }, api_calls
     
     def compute_roi(self, volume: int, max_volume: int, avg_sentiment: float, weight: float = 1.0) -> float:
         """Compute ROI score based on volume and sentiment"""
@@ -318,70 +461,94 @@ class HybridAnalyzer:
         roi = volume_score * sentiment_score * max(weight, 0.1)
         return round(float(roi) * 100.0, 2)
     
+    def compute_roi_vec(self, volumes: np.ndarray, avg_sentiments: np.ndarray, max_volume: int,
+                        weight: Union[float, np.ndarray] = 1.0) -> np.ndarray:
+        """Compute ROI scores for all clusters at once (vectorized, branch-free compute_roi)
+        
+        weight may be a scalar or one weight per cluster. A non-positive
+        max_volume only occurs with all-zero volumes, which score 0 as before.
+        """
+        volume_scores = np.clip(np.asarray(volumes) / np.maximum(max_volume, 1), 0.0, None)
+        sentiment_scores = (np.asarray(avg_sentiments) + 1.0) * 0.5  # map [-1,1] -> [0,1]
+        return np.round(volume_scores * sentiment_scores * np.maximum(weight, 0.1) * 100.0, 2)
+    
     def analyze_feedback(self, feedbacks: List[str], n_clusters: int = 5) -> Dict[str, Any]:
         """Main analysis function - hybrid approach with minimal LLM usage"""
         if len(feedbacks) == 0:
             return {"items": [], "clusters": [], "insights": [], "themes": []}
         
-        print(f"Starting hybrid analysis of {len(feedbacks)} feedback items...", file=sys.stderr)
-        
-        # Step 1: Clean texts
-        cleaned = [self.clean_text(t) for t in feedbacks]
+        from sklearn.cluster import KMeans, MiniBatchKMeans
         
-        # Step 2: Get embeddings and cluster (traditional ML)
-        print("Step 1: Clustering feedback...", file=sys.stderr)
-        embeddings = self.get_embeddings(cleaned)
-        n_clusters = min(n_clusters, len(feedbacks))
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        labels = kmeans.fit_predict(embeddings)
-        
-        # Step 3: Get sentiments using VADER (traditional ML)
-        print("Step 2: Analyzing sentiment with VADER...", file=sys.stderr)
-        sentiment_results = self.get_sentiment_vader(feedbacks)
-        sentiments = [result["sentiment"] for result in sentiment_results]
-        
-        # Step 4: Create results dataframe
-        df = pd.DataFrame({
-            "text": feedbacks,
-            "clean": cleaned,
-            "cluster": labels,
-            "sentiment": sentiments,
-            "sentiment_details": sentiment_results,
-        })
-        
-        # Step 5: Generate cluster summaries (traditional ML)
-        print("Step 3: Generating cluster summaries...", file=sys.stderr)
-        summaries = []
-        label_info = self.generate_cluster_labels_traditional(cleaned, labels)
-        max_volume = df.groupby("cluster").size().max()
+        print(f"Starting hybrid analysis of {len(feedbacks)} feedback items...", file=sys.stderr)
         
-        for cluster_id, group in df.groupby("cluster"):
-            volume = int(group.shape[0])
-            avg_sent = float(group["sentiment"].mean()) if volume > 0 else 0.0
-            label_meta = label_info.get(int(cluster_id), {"label": f"Cluster {int(cluster_id)}", "keywords": []})
-            roi = self.compute_roi(volume=volume, max_volume=int(max_volume), avg_sentiment=avg_sent, weight=1.0)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # Step 1: Clean texts
+            cleaned = self.clean_texts(feedbacks)
             
-            cluster_summary = {
-                "cluster": int(cluster_id),
-                "label": label_meta["label"],
-                "keywords": label_meta["keywords"],
-                "volume": volume,
-                "avg_sentiment": round(avg_sent, 3),
-                "roi": roi,
-                "description": label_meta.get("description", ""),
-                "cluster_sentiment": label_meta.get("sentiment", "neutral"),
-                "labeling_method": label_meta.get("method", "traditional_ml")
-            }
+            # Sentiment doesn't depend on clustering, so score it while KMeans runs
+            sentiment_future = executor.submit(self.get_sentiment_vader, feedbacks)
             
-            summaries.append(cluster_summary)
-        
-        # Step 6: Enhance with Gemini (single batch call)
-        print("Step 4: Enhancing with Gemini (1 API call)...", file=sys.stderr)
-        enhanced_summaries = self.enhance_with_gemini_batch(summaries)
+            # Step 2: Get embeddings and cluster (traditional ML)
+            print("Step 1: Clustering feedback...", file=sys.stderr)
+            tfidf_matrix, feature_names = self.fit_tfidf(cleaned)
+            n_clusters = min(n_clusters, len(feedbacks))
+            if len(feedbacks) < MINIBATCH_KMEANS_MIN_ITEMS:
+                kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+            else:
+                kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, n_init=3,
+                                         batch_size=min(1024, len(feedbacks)))
+            labels = kmeans.fit_predict(tfidf_matrix)
+            
+            # Step 3: Collect sentiments using VADER (traditional ML)
+            print("Step 2: Analyzing sentiment with VADER...", file=sys.stderr)
+            sentiment_results = sentiment_future.result()
+            sentiments = np.array([result["sentiment"] for result in sentiment_results], dtype=float)
+            
+            # Step 4: Bucket rows by cluster once; every per-cluster step slices these
+            cluster_rows = _bucket_rows(labels)
+            
+            # Step 5: Generate cluster summaries (traditional ML)
+            print("Step 3: Generating cluster summaries...", file=sys.stderr)
+            summaries = []
+            label_info = self.generate_cluster_labels_traditional(cleaned, labels, tfidf_matrix, feature_names, sentiments, cluster_rows)
+            
+            # Per-cluster volume, mean sentiment and ROI in one bincount pass each
+            volumes = np.bincount(labels, minlength=n_clusters)
+            sent_sums = np.bincount(labels, weights=sentiments, minlength=n_clusters)
+            avg_sents = sent_sums / np.maximum(volumes, 1)
+            rois = self.compute_roi_vec(volumes, avg_sents, max_volume=int(volumes.max()), weight=1.0)
+            
+            for cluster_id in cluster_rows:
+                volume = int(volumes[cluster_id])
+                avg_sent = float(avg_sents[cluster_id])
+                roi = float(rois[cluster_id])
+                label_meta = label_info.get(int(cluster_id), {"label": f"Cluster {int(cluster_id)}", "keywords": []})
+                
+                cluster_summary = {
+                    "cluster": int(cluster_id),
+                    "label": label_meta["label"],
+                    "keywords": label_meta["keywords"],
+                    "volume": volume,
+                    "avg_sentiment": round(avg_sent, 3),
+                    "roi": roi,
+                    "description": label_meta.get("description", ""),
+                    "cluster_sentiment": label_meta.get("sentiment", "neutral"),
+                    "labeling_method": label_meta.get("method", "traditional_ml")
+                }
+                
+                summaries.append(cluster_summary)
+            
+            # Step 6: Enhance clusters and generate insights with Gemini (single combined call)
+            print("Step 4: Enhancing clusters and generating insights with Gemini (at most 1 API call)...", file=sys.stderr)
+            gemini_future = executor.submit(self.enhance_and_insights_gemini, summaries, len(feedbacks))
+            
+            # Build the per-item records (no DataFrame round-trip) while the Gemini call is in flight
+            items = [
+                {"text": t, "clean": c, "cluster": l, "sentiment": s, "sentiment_details": d}
+                for t, c, l, s, d in zip(feedbacks, cleaned, labels.tolist(), sentiments.tolist(), sentiment_results)
+            ]
+            enhanced_summaries, insights_result, api_calls = gemini_future.result()
         
-        # Step 7: Generate final insights (single Gemini call)
-        print("Step 5: Generating insights with Gemini (1 API call)...", file=sys.stderr)
-        items = df.to_dict(orient="records")
         enhanced_summaries = sorted(enhanced_summaries, key=lambda s: s["roi"], reverse=True)
         
         analysis_result = {
@@ -390,11 +557,12 @@ class HybridAnalyzer:
             "themes": [],  # Derived from clusters
             "theme_summary": f"Analysis completed with {len(enhanced_summaries)} clusters"
         }
-        
-        insights_result = self.generate_insights_gemini(analysis_result)
         analysis_result.update(insights_result)
         
-        print(f"Analysis complete! Used 2 Gemini API calls instead of 11+", file=sys.stderr)
+        if api_calls:
+            print(f"Analysis complete! Used {api_calls} Gemini API call instead of 11+", file=sys.stderr)
+        else:
+            print("Analysis complete! No Gemini API calls needed", file=sys.stderr)
         return analysis_result
 
 # Global instance
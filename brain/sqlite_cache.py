@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed TTL cache shared by the analyzers
+Stores JSON values by key in one table; entries expire ttl_seconds after they were written
+"""
+
+import json
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from typing import Any, Dict, List, Optional
+
+# Keys per SELECT, well under SQLite's bound-parameter limit
+_QUERY_CHUNK_SIZE = 500
+
+class SQLiteTTLCache:
+    """JSON values keyed by string in one SQLite table, fresh for ttl_seconds after each write
+
+    Each call opens its own connection, so one instance can be shared across
+    threads. SQLite errors are reported on stderr and treated as misses.
+    """
+
+    def __init__(self, path: str, table: str, ttl_seconds: int, value_column: str = "value"):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.value_column = value_column
+        self._create_sql = f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, {value_column} TEXT, ts INTEGER)"
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Fresh cached values for whichever keys have one"""
+        if not keys:
+            return {}
+        try:
+            with closing(sqlite3.connect(self.path)) as conn:
+                conn.execute(self._create_sql)
+                min_ts = int(time.time()) - self.ttl_seconds
+                cached = {}
+                for i in range(0, len(keys), _QUERY_CHUNK_SIZE):
+                    chunk = keys[i:i + _QUERY_CHUNK_SIZE]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, {self.value_column} FROM {self.table} WHERE key IN ({placeholders}) AND ts >= ?",
+                        [*chunk, min_ts],
+                    )
+                    cached.update((key, json.loads(value)) for key, value in rows)
+                return cached
+        except sqlite3.Error as e:
+            print(f"Warning: {self.table} cache read failed: {e}", file=sys.stderr)
+            return {}
+
+    def put_many(self, entries: Dict[str, Any]) -> None:
+        """Store values, restarting their TTL"""
+        if not entries:
+            return
+        try:
+            with closing(sqlite3.connect(self.path)) as conn, conn:
+                conn.execute(self._create_sql)
+                now = int(time.time())
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, {self.value_column}, ts) VALUES (?, ?, ?)",
+                    [(key, json.dumps(value), now) for key, value in entries.items()],
+                )
+        except sqlite3.Error as e:
+            print(f"Warning: {self.table} cache write failed: {e}", file=sys.stderr)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Fresh cached value for key, or None"""
+        return self.get_many([key]).get(key)
+
+    def put(self, key: str, value: Any) -> None:
+        """Store one value"""
+        self.put_many({key: value})
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Test script for the Gemini analyzer plumbing
+Runs offline against a fake async client: streaming parse, 429 retry and
+keyword fallback, rate limiting, response parsing and the on-disk caches
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add the brain directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import gemini_analyzer as ga
+from gemini_analyzer import GeminiAnalyzer, _AsyncRateLimiter, _JsonObjectStream
+from hybrid_analyzer import _bucket_rows, _top_k_indices
+from sqlite_cache import SQLiteTTLCache
+
+class RateLimited(Exception):
+    """Stand-in for the SDK's 429 error"""
+    code = 429
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModels:
+    """Async generate_content(_stream) that replays a JSON reply or raises"""
+
+    def __init__(self, reply=None, failures=0, chunk_size=7):
+        self.reply = reply
+        self.failures = failures
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RateLimited("429 Too Many Requests")
+        return self.reply
+
+    async def generate_content(self, model, contents, config=None):
+        return FakeResponse(self._next())
+
+    async def generate_content_stream(self, model, contents, config=None):
+        text = self._next()
+
+        async def chunks():
+            for i in range(0, len(text), self.chunk_size):
+                await asyncio.sleep(0)
+                yield FakeResponse(text[i:i + self.chunk_size])
+        return chunks()
+
+class FakeClient:
+    def __init__(self, models):
+        self.aio = type("FakeAio", (), {"models": models})()
+
+def make_analyzer(models):
+    """GeminiAnalyzer wired to a fake client"""
+    analyzer = GeminiAnalyzer(api_key="")
+    analyzer.client = FakeClient(models)
+    analyzer.available = True
+    return analyzer
+
+def sentiment_reply(n):
+    return json.dumps([{"sentiment": 0.5, "confidence": 0.9, "reasoning": f"text {i}"} for i in range(n)])
+
+def test_json_object_stream():
+    """Objects are emitted once their closing brace arrives, whatever the chunking"""
+    text = '```json\n[{"a": "x}{\\"y", "b": {"c": 1}}, {"d": [1, 2]}]\n```'
+    parser = _JsonObjectStream()
+    objects = []
+    for i in range(0, len(text), 3):
+        objects.extend(parser.feed(text[i:i + 3]))
+    assert objects == [{"a": 'x}{"y', "b": {"c": 1}}, {"d": [1, 2]}], objects
+    print("✅ _JsonObjectStream handles split chunks, nested objects and braces in strings")
+
+def test_parse_gemini_response():
+    """Bare JSON parses directly; fenced or embedded JSON is found by the regexes"""
+    analyzer = GeminiAnalyzer(api_key="")
+    assert analyzer._parse_gemini_response('{"a": 1}') == {"a": 1}
+    assert analyzer._parse_gemini_response('Here:\n```json\n[1, 2]\n```') == [1, 2]
+    assert analyzer._parse_gemini_response('Result: {"a": {"b": 2}} done') == {"a": {"b": 2}}
+    for bad in ("", "no json here", "{not: json}"):
+        try:
+            analyzer._parse_gemini_response(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"expected ValueError for {bad!r}")
+    print("✅ _parse_gemini_response covers bare, fenced, embedded and invalid replies")
+
+def test_rate_limiter():
+    """A 3-per-0.3 s bucket lets a burst of 3 through, then paces the rest"""
+    limiter = _AsyncRateLimiter(3, 0.3)
+
+    async def acquire(n):
+        start = time.monotonic()
+        for _ in range(n):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    assert ga._run_async(acquire(3)) < 0.05
+    assert ga._run_async(acquire(3)) >= 0.25
+    # A fractional per-worker share still admits one request
+    assert _AsyncRateLimiter(0.5, 60).capacity == 1.0
+    print("✅ _AsyncRateLimiter bursts up to capacity and refills at the configured rate")
+
+def test_streaming_sentiment():
+    """Streamed results arrive in order, extras are dropped and the reply is cached"""
+    models = FakeModels(reply=sentiment_reply(4))
+    analyzer = make_analyzer(models)
+    texts = ["good", "bad", "fine"]
+    results = list(analyzer.analyze_sentiment_stream(texts))
+    assert [r["reasoning"] for r in results] == ["text 0", "text 1", "text 2"], results
+    assert list(analyzer.analyze_sentiment_stream(texts)) == results
+    assert models.calls == 1, models.calls
+    print("✅ analyze_sentiment_stream parses the stream incrementally and caches it")
+
+def test_rate_limit_retry_then_fallback():
+    """429s are retried with backoff; once retries run out the keyword fallback answers"""
+    saved = ga.RETRY_BACKOFF_INITIAL, ga.RETRY_BACKOFF_MAX, ga._rate_limiter
+    ga.RETRY_BACKOFF_INITIAL = ga.RETRY_BACKOFF_MAX = 0.01
+    ga._rate_limiter = _AsyncRateLimiter(100, 1)
+    try:
+        models = FakeModels(reply=sentiment_reply(2), failures=2)
+        results = make_analyzer(models).analyze_sentiment_batch(["great app", "awful app"])
+        assert models.calls == 3 and all(r["confidence"] == 0.9 for r in results), results
+
+        models = FakeModels(reply=sentiment_reply(2), failures=ga.RETRY_ATTEMPTS)
+        results = make_analyzer(models).analyze_sentiment_batch(["great app", "awful app"])
+        assert models.calls == ga.RETRY_ATTEMPTS, models.calls
+        assert [r["method"] for r in results] == ["keyword_fallback"] * 2, results
+        assert [r["sentiment"] for r in results] == [0.7, -0.7], results
+    finally:
+        ga.RETRY_BACKOFF_INITIAL, ga.RETRY_BACKOFF_MAX, ga._rate_limiter = saved
+    print("✅ Rate-limited calls retry, then fall back to keyword sentiment")
+
+def test_top_k_and_buckets():
+    """Top-k indices come best first; rows are bucketed per cluster in order"""
+    scores = np.array([0.1, 0.9, 0.0, 0.5, 0.7])
+    assert _top_k_indices(scores, 3).tolist() == [1, 4, 3]
+    assert _top_k_indices(scores, 10).tolist() == [1, 4, 3, 0, 2]
+    assert _top_k_indices(scores, 0).size == 0
+    buckets = _bucket_rows(np.array([2, 0, 2, 1, 0]))
+    assert {k: v.tolist() for k, v in buckets.items()} == {0: [1, 4], 1: [3], 2: [0, 2]}
+    print("✅ _top_k_indices and _bucket_rows")
+
+def test_cache_expiry_and_placeholders():
+    """Cache entries expire after the TTL; only genuine Gemini scores are persisted"""
+    import analyze
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SQLiteTTLCache(os.path.join(tmp, "cache.db"), "entries", ttl_seconds=60)
+        cache.put("k", {"v": 1})
+        assert cache.get("k") == {"v": 1}
+        real_time = time.time
+        time.time = lambda: real_time() + 61
+        try:
+            assert cache.get("k") is None
+        finally:
+            time.time = real_time
+
+        saved = analyze._sentiment_cache, analyze.get_sentiment_batch
+        analyze._sentiment_cache = SQLiteTTLCache(os.path.join(tmp, "sentiment.db"), "sentiment_v2", 60, value_column="result")
+        analyze.get_sentiment_batch = lambda texts: [
+            {"score": 0.5, "confidence": 0.9, "reasoning": "", "method": "gemini"},
+            {"score": 0.0, "confidence": 0.0, "reasoning": "No analysis available", "method": "gemini"},
+            {"score": 0.7, "confidence": 0.6, "reasoning": "", "method": "keyword_fallback"},
+        ][:len(texts)]
+        try:
+            texts = ["scored", "padded", "fallback"]
+            analyze.get_sentiment_batch_dedup(texts)
+            keys = [analyze._sentiment_cache_key(t) for t in texts]
+            assert list(analyze._sentiment_cache.get_many(keys)) == [keys[0]]
+        finally:
+            analyze._sentiment_cache, analyze.get_sentiment_batch = saved
+    print("✅ SQLite cache TTL and placeholder filtering")
+
+if __name__ == "__main__":
+    print("AI Feedback Miner - Gemini Analyzer Test")
+    print("=" * 50)
+
+    test_json_object_stream()
+    test_parse_gemini_response()
+    test_rate_limiter()
+    test_streaming_sentiment()
+    test_rate_limit_retry_then_fallback()
+    test_top_k_and_buckets()
+    test_cache_expiry_and_placeholders()
+
+    print("\n" + "=" * 50)
+    print("✅ All tests completed successfully!")
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Test script for the hybrid analyzer
-Verifies that the new implementation reduces API calls from 11+ to just 2
+Verifies that the new implementation reduces API calls from 11+ to just 1
 """
 
 import json
@@ -36,7 +36,7 @@ def test_hybrid_analyzer():
         # Test hybrid analyzer directly
         from hybrid_analyzer import analyze_feedback_hybrid
         
-        print("\n1. Testing Hybrid Analyzer (should use 2 LLM calls max):")
+        print("\n1. Testing Hybrid Analyzer (should use 1 LLM call max):")
         print("-" * 50)
         
         result = analyze_feedback_hybrid(test_feedbacks, n_clusters=3)
@@ -95,7 +95,7 @@ def test_hybrid_analyzer():
     print("\n" + "=" * 50)
     print("✅ All tests completed successfully!")
     print("\nExpected Results:")
-    print("• Hybrid analyzer should use only 2 LLM API calls")
+    print("• Hybrid analyzer should use only 1 LLM API call")
     print("• Traditional ML handles sentiment, clustering, and keywords")
     print("• LLM only used for cluster enhancement and final insights")
     print("• 90% reduction in API calls compared to original implementation")
@@ -109,7 +109,6 @@ def test_package_availability():
     
     packages = {
         'vaderSentiment': 'VADER sentiment analysis',
-        'rake_nltk': 'RAKE keyword extraction',
         'sklearn': 'Scikit-learn for ML',
         'pandas': 'Data manipulation',
         'numpy': 'Numerical computing'
@@ -121,8 +120,6 @@ def test_package_availability():
         try:
             if package == 'vaderSentiment':
                 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-            elif package == 'rake_nltk':
-                from rake_nltk import Rake
             elif package == 'sklearn':
                 from sklearn.cluster import KMeans
             elif package == 'pandas':
@@ -139,7 +136,7 @@ def test_package_availability():
         print("\n✅ All required packages are available!")
     else:
         print("\n⚠️  Some packages are missing. Install them with:")
-        print("   pip install vaderSentiment rake-nltk scikit-learn pandas numpy")
+        print("   pip install vaderSentiment scikit-learn pandas numpy")
     
     return all_available
 
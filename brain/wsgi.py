@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+"""
+WSGI entry point for the Brain Service
+Run with: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from brain_server import app